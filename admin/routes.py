@@ -1,10 +1,20 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify
+from flask import render_template, redirect, url_for, flash, request, jsonify, Response, stream_with_context, send_file
 from flask_login import login_required, current_user
 from . import admin_bp
 from model.db_models import User, Post, ForumTopic, ForumPost, Voting, VotingOption, Vote, Property, db
-from sqlalchemy import or_, and_, desc, asc
+from sqlalchemy import or_, desc, asc, func
 from datetime import datetime, timedelta
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, contains_eager
+from utils.vote_counters import remove_votes
+from utils.voting_results import get_snapshot, invalidate_snapshots
+from utils.ballot_import import read_ballot_rows, import_ballots
+from utils.property_import import read_property_rows, import_properties
+from utils.voting_export import iter_csv, write_xlsx
+from utils.live_results import broker
+from utils.voting_listing import voting_list_query
+from utils.keyset import keyset_paginate
+from utils.forum_moderation import delete_posts, delete_topics
+import tempfile
 
 def admin_required(f):
     from functools import wraps
@@ -296,7 +306,7 @@ def forum_topics():
     sort_by = request.args.get('sort', 'created_at')
     sort_order = request.args.get('order', 'desc')
     
-    query = ForumTopic.query.join(User)
+    query = ForumTopic.query.join(ForumTopic.user)
     
     # Поиск
     if search:
@@ -324,8 +334,7 @@ def forum_topics():
 def delete_forum_topic(topic_id):
     topic = ForumTopic.query.get_or_404(topic_id)
     title = topic.title
-    db.session.delete(topic)
-    db.session.commit()
+    delete_topics([topic_id])
     flash(f'Тема "{title}" удалена', 'success')
     return redirect(url_for('admin.forum_topics'))
 
@@ -334,20 +343,16 @@ def delete_forum_topic(topic_id):
 @admin_required
 def forum_topics_mass_action():
     action = request.form.get('action')
-    topic_ids = request.form.getlist('topic_ids')
+    topic_ids = request.form.getlist('topic_ids', type=int)
     
     if not topic_ids:
         flash('Не выбрано ни одной темы', 'warning')
         return redirect(url_for('admin.forum_topics'))
     
-    topics = ForumTopic.query.filter(ForumTopic.id.in_(topic_ids)).all()
-    
     if action == 'delete':
-        for topic in topics:
-            db.session.delete(topic)
-        flash(f'Удалено {len(topics)} тем', 'success')
+        deleted = delete_topics(topic_ids)
+        flash(f'Удалено {deleted} тем', 'success')
     
-    db.session.commit()
     return redirect(url_for('admin.forum_topics'))
 
 # ===== УПРАВЛЕНИЕ СООБЩЕНИЯМИ ФОРУМА =====
@@ -365,7 +370,7 @@ def forum_posts():
     sort_by = request.args.get('sort', 'created_at')
     sort_order = request.args.get('order', 'desc')
     
-    query = ForumPost.query.join(User).join(ForumTopic)
+    query = ForumPost.query.join(ForumPost.user).join(ForumPost.topic)
     
     # Поиск
     if search:
@@ -397,9 +402,9 @@ def forum_posts():
 def delete_forum_post(post_id):
     post = ForumPost.query.get_or_404(post_id)
     content_preview = post.content[:50] + '...' if len(post.content) > 50 else post.content
-    db.session.delete(post)
-    db.session.commit()
-    flash(f'Сообщение "{content_preview}" удалено', 'success')
+    deleted = delete_posts([post_id])
+    replies = f' вместе с ответами ({deleted - 1})' if deleted > 1 else ''
+    flash(f'Сообщение "{content_preview}" удалено{replies}', 'success')
     return redirect(url_for('admin.forum_posts'))
 
 @admin_bp.route('/forum-posts/mass-action', methods=['POST'])
@@ -407,20 +412,17 @@ def delete_forum_post(post_id):
 @admin_required
 def forum_posts_mass_action():
     action = request.form.get('action')
-    post_ids = request.form.getlist('post_ids')
+    post_ids = request.form.getlist('post_ids', type=int)
     
     if not post_ids:
         flash('Не выбрано ни одного сообщения', 'warning')
         return redirect(url_for('admin.forum_posts'))
     
-    posts = ForumPost.query.filter(ForumPost.id.in_(post_ids)).all()
-    
     if action == 'delete':
-        for post in posts:
-            db.session.delete(post)
-        flash(f'Удалено {len(posts)} сообщений', 'success')
+        # Считаются и удаленные вместе с выбранными ответы
+        deleted = delete_posts(post_ids)
+        flash(f'Удалено {deleted} сообщений', 'success')
     
-    db.session.commit()
     return redirect(url_for('admin.forum_posts'))
 
 # ===== API для AJAX =====
@@ -473,7 +475,7 @@ def votings():
     sort_by = request.args.get('sort', 'created_at')
     sort_order = request.args.get('order', 'desc')
     
-    query = Voting.query.join(User)
+    query = voting_list_query()
     
     # Поиск
     if search:
@@ -495,20 +497,9 @@ def votings():
     elif status == 'inactive':
         query = query.filter(Voting.is_active.is_(False))
     elif status == 'open':
-        now = datetime.utcnow()
-        query = query.filter(
-            and_(
-                Voting.start_date <= now,
-                Voting.end_date >= now,
-                Voting.is_active.is_(True)
-            )
-        )
-    elif status == 'closed':
-        now = datetime.utcnow()
-        query = query.filter(Voting.end_date < now)
-    elif status == 'upcoming':
-        now = datetime.utcnow()
-        query = query.filter(Voting.start_date > now)
+        query = query.filter(Voting.state == 'open', Voting.is_active.is_(True))
+    elif status in ('closed', 'upcoming'):
+        query = query.filter(Voting.state == status)
     
     # Сортировка
     if sort_order == 'desc':
@@ -528,9 +519,81 @@ def votings():
 @admin_required
 def voting_detail(voting_id):
     voting = Voting.query.get_or_404(voting_id)
-    results, total_votes = voting.get_results()
+    snapshot = get_snapshot(voting)
+    if snapshot:
+        results, total_votes = snapshot['results'], snapshot['total_votes']
+    else:
+        results, total_votes = voting.get_results()
     return render_template('admin/voting_detail.html', voting=voting, results=results, total_votes=total_votes, datetime=datetime)
 
+@admin_bp.route('/votings/<int:voting_id>/import-ballots', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_voting_ballots(voting_id):
+    """Импорт бумажных бюллетеней из CSV/XLSX"""
+    voting = Voting.query.get_or_404(voting_id)
+    report = None
+    dry_run = False
+    
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        dry_run = bool(request.form.get('dry_run'))
+        if not upload or not upload.filename:
+            flash('Выберите файл с бюллетенями', 'warning')
+            return redirect(url_for('admin.import_voting_ballots', voting_id=voting_id))
+        try:
+            rows = read_ballot_rows(upload.stream, upload.filename)
+        except (ValueError, UnicodeDecodeError) as e:
+            flash(f'Не удалось прочитать файл: {e}', 'danger')
+            return redirect(url_for('admin.import_voting_ballots', voting_id=voting_id))
+        
+        report = import_ballots(voting, rows, dry_run=dry_run)
+        if report['errors']:
+            flash(f'Найдено ошибок: {report["errors"]}. Голоса не добавлены', 'danger')
+        elif dry_run:
+            flash(f'Проверка пройдена: {len(report["rows"])} бюллетеней', 'info')
+        else:
+            for option_id, (count, area) in report['totals'].items():
+                broker.publish(voting.id, option_id, count, area)
+            flash(f'Добавлено {report["imported"]} голосов', 'success')
+    
+    return render_template('admin/ballots_import.html', voting=voting, report=report, dry_run=dry_run)
+
+@admin_bp.route('/votings/<int:voting_id>/export.<fmt>')
+@login_required
+@admin_required
+def export_voting(voting_id, fmt):
+    """Выгрузка поименных результатов голосования в CSV/XLSX"""
+    voting = Voting.query.get_or_404(voting_id)
+    filename = f'voting_{voting.id}_results.{fmt}'
+    
+    if fmt == 'csv':
+        return Response(
+            stream_with_context(iter_csv(voting.id)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    
+    if fmt == 'xlsx':
+        # Книга пишется во временный файл и отдается с диска кусками
+        tmp = tempfile.TemporaryFile()
+        try:
+            write_xlsx(voting.id, tmp)
+        except ValueError as e:
+            tmp.close()
+            flash(str(e), 'danger')
+            return redirect(url_for('admin.voting_detail', voting_id=voting_id))
+        tmp.seek(0)
+        return send_file(
+            tmp,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=filename
+        )
+    
+    flash('Неизвестный формат выгрузки', 'warning')
+    return redirect(url_for('admin.voting_detail', voting_id=voting_id))
+
 @admin_bp.route('/votings/<int:voting_id>/toggle-status', methods=['POST'])
 @login_required
 @admin_required
@@ -586,16 +649,17 @@ def votings_mass_action():
 @login_required
 @admin_required
 def votes():
-    page = request.args.get('page', 1, type=int)
     per_page = 20
     
     # Фильтры
     voting_title = request.args.get('voting', '')
     property_number = request.args.get('property', '')
-    sort_by = request.args.get('sort', 'voted_at')
     sort_order = request.args.get('order', 'desc')
     
-    query = Vote.query.join(Voting).join(Property)
+    # Голосование, квартира и вариант подгружаются тем же запросом
+    query = Vote.query.join(Vote.voting).join(Vote.property).join(Vote.option).options(
+        contains_eager(Vote.voting), contains_eager(Vote.property), contains_eager(Vote.option)
+    )
     
     # Фильтр по голосованию
     if voting_title:
@@ -605,25 +669,33 @@ def votes():
     if property_number:
         query = query.filter(Property.number.ilike(f'%{property_number}%'))
     
-    # Сортировка
-    if sort_order == 'desc':
-        query = query.order_by(desc(getattr(Vote, sort_by)))
-    else:
-        query = query.order_by(asc(getattr(Vote, sort_by)))
+    # Без фильтров общее число берем из счетчиков голосований, с фильтрами
+    # не считаем вовсе: COUNT по JOIN растет вместе с таблицей vote
+    total = None
+    if not voting_title and not property_number:
+        total = db.session.query(func.coalesce(func.sum(Voting.votes_count), 0)).scalar()
     
-    votes = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Страницы по курсору (voted_at, id) — индекс ix_vote_voted_at
+    votes = keyset_paginate(query, Vote.voted_at, Vote.id, per_page=per_page,
+                            after=request.args.get('after'), before=request.args.get('before'),
+                            descending=sort_order != 'asc', total=total)
     
     return render_template('admin/votes.html', votes=votes,
                          voting_title=voting_title, property_number=property_number,
-                         sort_by=sort_by, sort_order=sort_order)
+                         sort_order=sort_order)
 
 @admin_bp.route('/votes/<int:vote_id>/delete', methods=['POST'])
 @login_required
 @admin_required
 def delete_vote(vote_id):
     vote = Vote.query.get_or_404(vote_id)
+    removed = remove_votes([vote.id])
+    invalidate_snapshots({row[0] for row in removed})
     db.session.delete(vote)
     db.session.commit()
+    # Зрители живых результатов получают отрицательное приращение
+    for voting_id, option_id, count, area in removed:
+        broker.publish(voting_id, option_id, -count, -area)
     flash('Голос удален', 'success')
     return redirect(url_for('admin.votes'))
 
@@ -640,12 +712,46 @@ def votes_mass_action():
     
     votes = Vote.query.filter(Vote.id.in_(vote_ids)).all()
     
+    removed = []
     if action == 'delete':
+        removed = remove_votes([vote.id for vote in votes])
+        invalidate_snapshots({row[0] for row in removed})
         for vote in votes:
             db.session.delete(vote)
         flash(f'Удалено {len(votes)} голосов', 'success')
     
     db.session.commit()
+    for voting_id, option_id, count, area in removed:
+        broker.publish(voting_id, option_id, -count, -area)
     return redirect(url_for('admin.votes'))
 
- 
\ No newline at end of file
+ 
+@admin_bp.route('/properties/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_property_registry():
+    """Импорт реестра квартир из CSV/XLSX"""
+    report = None
+    dry_run = False
+    
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        dry_run = bool(request.form.get('dry_run'))
+        if not upload or not upload.filename:
+            flash('Выберите файл реестра', 'warning')
+            return redirect(url_for('admin.import_property_registry'))
+        try:
+            rows = read_property_rows(upload.stream, upload.filename)
+        except (ValueError, UnicodeDecodeError) as e:
+            flash(f'Не удалось прочитать файл: {e}', 'danger')
+            return redirect(url_for('admin.import_property_registry'))
+        
+        report = import_properties(rows, dry_run=dry_run)
+        if report['errors']:
+            flash(f'Найдено ошибок: {report["errors"]}. Квартиры не добавлены', 'danger')
+        elif dry_run:
+            flash(f'Проверка пройдена: {len(report["rows"])} строк, уже в реестре {report["skipped"]}', 'info')
+        else:
+            flash(f'Добавлено {report["imported"]} квартир, пропущено {report["skipped"]}', 'success')
+    
+    return render_template('admin/properties_import.html', report=report, dry_run=dry_run)
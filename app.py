@@ -19,6 +19,10 @@ from forum import forum
 from security import security
 from telegram_bot import telegram_bot
 from admin import admin_bp
+# Импорт планировщика открытия/закрытия голосований
+from utils.voting_scheduler import scheduler
+# Фоновая рассылка уведомлений подписчикам тем форума
+from utils.forum_subscriptions import fanout
 
 
 
@@ -66,6 +70,10 @@ def create_app(config_name='default'):
     with app.app_context():
         db.create_all()
     
+    # Фоновый планировщик голосований стартует при первом запросе
+    scheduler.init_app(app)
+    fanout.init_app(app)
+    
     # Добавление переменной datetime в контекст всех шаблонов Jinja2
     @app.context_processor
     def inject_datetime():
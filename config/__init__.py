@@ -8,6 +8,12 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Кворум собрания собственников, % от общей площади квартир
+    VOTING_QUORUM_PERCENT = float(os.environ.get('VOTING_QUORUM_PERCENT') or 50)
+    # Фоновый планировщик открытия/закрытия голосований (utils/voting_scheduler.py)
+    VOTING_SCHEDULER = os.environ.get('VOTING_SCHEDULER', '1') != '0'
+    # Рассылка уведомлений подписчикам темы в фоновом потоке (utils/forum_subscriptions.py)
+    FORUM_FANOUT_BACKGROUND = os.environ.get('FORUM_FANOUT_BACKGROUND', '1') != '0'
 
 class DevelopmentConfig(Config):
     """Конфигурация для разработки"""
@@ -20,6 +26,8 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Конфигурация для тестирования"""
     TESTING = True
+    VOTING_SCHEDULER = False
+    FORUM_FANOUT_BACKGROUND = False
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
 
 config = {
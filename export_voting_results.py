@@ -0,0 +1,39 @@
+from app import app, db
+from model.db_models import Voting
+from utils.voting_export import iter_csv, write_xlsx
+
+def export_voting_results(voting_id, path=None):
+    """Выгружает поименные результаты голосования в CSV/XLSX или CSV в stdout"""
+    with app.app_context():
+        voting = db.session.get(Voting, voting_id)
+        if voting is None:
+            print(f'❌ Голосование {voting_id} не найдено')
+            return False
+        
+        try:
+            if path is None:
+                import sys
+                for chunk in iter_csv(voting.id):
+                    sys.stdout.buffer.write(chunk)
+                return True
+            if path.lower().endswith('.xlsx'):
+                write_xlsx(voting.id, path)
+            else:
+                with open(path, 'wb') as output:
+                    for chunk in iter_csv(voting.id):
+                        output.write(chunk)
+        except (OSError, ValueError) as e:
+            print(f'❌ Ошибка выгрузки: {e}')
+            return False
+        
+        print(f'✅ Результаты голосования "{voting.title}" выгружены в {path}')
+        return True
+
+if __name__ == '__main__':
+    import sys
+    
+    if len(sys.argv) > 1:
+        export_voting_results(int(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        print('Использование: python export_voting_results.py <voting_id> [file.csv|file.xlsx]')
+        print('\nБез имени файла CSV выводится в stdout')
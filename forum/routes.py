@@ -3,14 +3,29 @@ from flask_login import login_required, current_user
 from . import forum
 from model.db_models import db, ForumTopic, ForumPost, User, Notification
 from datetime import datetime
+from markupsafe import Markup
+from sqlalchemy.orm import joinedload
 from utils.content_password import check_content_access, has_content_password, set_content_password, remove_content_password
+from utils.forum_tree import parse_thread_cursor, load_thread_page, load_replies, thread_cursor_for
+from utils.forum_stats import post_added, posts_changed
+from utils.forum_moderation import delete_posts, delete_topics
+from utils.forum_reads import mark_topic_read, with_read_marks
+from utils.forum_subscriptions import fanout, subscribe, unsubscribe, is_subscribed
+from utils.fragment_cache import forum_threads
+from utils.forum_search import build_match_query, search_topics, search_posts
 
 @forum.route('/')
 def index():
     """Список тем форума"""
     page = request.args.get('page', 1, type=int)
-    topics = ForumTopic.query.order_by(ForumTopic.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False)
+    # Темы с последней активностью первыми (индекс по last_post_at); автор темы,
+    # автор последнего сообщения и отметка прочтения пользователя подгружаются
+    # тем же запросом
+    topics = with_read_marks(ForumTopic.query.options(
+        joinedload(ForumTopic.user), joinedload(ForumTopic.last_post_user)
+    ), current_user).order_by(
+        ForumTopic.last_post_at.desc(), ForumTopic.id.desc()
+    ).paginate(page=page, per_page=10, error_out=False)
     return render_template('forum/index.html', topics=topics)
 
 @forum.route('/topic/<int:topic_id>')
@@ -27,9 +42,66 @@ def view_topic(topic_id):
                              content_type='topic',
                              content_id=topic_id)
     
-    # Получаем только корневые сообщения (без parent_id) с загрузкой связанных ответов
-    root_posts = ForumPost.query.filter_by(topic_id=topic_id, parent_id=None).order_by(ForumPost.created_at.asc()).all()
-    return render_template('forum/topic.html', topic=topic, posts=root_posts)
+    # Отрисованная страница ветки кэшируется по версии темы: при попадании нет
+    # ни запросов сообщений, ни рендеринга дерева. Иначе корневые сообщения
+    # выбираются по курсору, ответы с авторами — одним запросом по диапазону
+    # path, глубокие ветки свернуты. Вместе с разметкой хранится наибольший id
+    # показанного сообщения — до него страница отмечает тему прочитанной.
+    # Ключ строится из разобранных курсоров: произвольные значения ?after=
+    # не плодят записей и не вытесняют настоящие страницы
+    after, before = parse_thread_cursor(request.args.get('after'), request.args.get('before'))
+    cache_key = (topic_id, topic.version, after, before)
+    cached = forum_threads.get(cache_key)
+    if cached is None:
+        page = load_thread_page(topic_id, after=after, before=before)
+        thread = render_template('forum/_thread.html', topic=topic, page=page, posts=page.items)
+        last_shown_id = max((item.node.post.id for item in page.items), default=None)
+        cached = (thread, last_shown_id)
+        forum_threads.set(cache_key, cached)
+    thread, last_shown_id = cached
+    
+    # Переход к сообщению из уведомления: предки нужны, чтобы развернуть свернутые ветки
+    focus = None
+    focus_id = request.args.get('focus', type=int)
+    if focus_id:
+        focus_post = db.session.get(ForumPost, focus_id)
+        if focus_post is not None and focus_post.topic_id == topic_id and focus_post.path:
+            focus = [int(segment) for segment in focus_post.path.split('/') if segment]
+    
+    # Сообщение из ссылки показано, даже если оно в свернутой ветке: ее
+    # разворачивает страница по focus
+    if focus:
+        last_shown_id = max(last_shown_id or 0, focus_id)
+    if mark_topic_read(current_user.id, topic_id, last_shown_id):
+        db.session.commit()
+    
+    return render_template('forum/topic.html', topic=topic, thread=Markup(thread),
+                           posts_count=topic.posts_count, focus=focus,
+                           subscribed=is_subscribed(current_user.id, topic_id))
+
+@forum.route('/topic/<int:topic_id>/post/<int:post_id>')
+def goto_post(topic_id, post_id):
+    """Переход к сообщению: открывает страницу темы, на которой оно показано"""
+    post = db.session.get(ForumPost, post_id)
+    if post is None or post.topic_id != topic_id:
+        return redirect(url_for('forum.view_topic', topic_id=topic_id))
+    after = thread_cursor_for(post)
+    return redirect(url_for('forum.view_topic', topic_id=topic_id, after=after, focus=post_id) + f'#post-{post_id}')
+
+@forum.route('/post/<int:post_id>/replies')
+def post_replies(post_id):
+    """HTML-фрагмент свернутой ветки: следующие уровни ответов на сообщение"""
+    post = db.session.get(ForumPost, post_id)
+    if post is None:
+        abort(404)
+    if not check_content_access('topic', post.topic_id):
+        abort(403)
+    items = load_replies(post)
+    # Догруженные ответы прочитаны: иначе тема, чье последнее сообщение
+    # в свернутой ветке, навсегда остается с новыми сообщениями
+    if mark_topic_read(current_user.id, post.topic_id, max((item.node.post.id for item in items), default=None)):
+        db.session.commit()
+    return render_template('forum/post_replies.html', items=items)
 
 @forum.route('/create', methods=['GET', 'POST'])
 @login_required
@@ -58,6 +130,10 @@ def create_topic():
         db.session.flush()  # Получаем id темы
         post = ForumPost(content=content, user_id=current_user.id, topic_id=topic.id)
         db.session.add(post)
+        db.session.flush()
+        post_added(post)
+        # Автор темы получает уведомления о новых сообщениях в ней
+        subscribe(current_user.id, topic.id)
         db.session.commit()
         flash('Тема создана!')
         return redirect(url_for('forum.view_topic', topic_id=topic.id))
@@ -85,8 +161,11 @@ def reply(topic_id):
     
     post = ForumPost(content=content, user_id=current_user.id, topic_id=topic_id, parent_id=parent_id)
     db.session.add(post)
+    db.session.flush()  # Нужен id сообщения для уведомления и статистики темы
+    post_added(post)
     
-    # Создаем уведомления
+    # Создаем уведомления; получивший личное уведомление не получает его же по подписке
+    notified = []
     if parent_id and parent_post.user_id != current_user.id:
         # Уведомление для автора родительского сообщения
         notification = Notification(
@@ -98,6 +177,7 @@ def reply(topic_id):
             post_id=post.id
         )
         db.session.add(notification)
+        notified.append(parent_post.user_id)
     elif topic.user_id != current_user.id:
         # Уведомление для автора темы (если это не ответ на конкретное сообщение)
         notification = Notification(
@@ -109,10 +189,16 @@ def reply(topic_id):
             post_id=post.id
         )
         db.session.add(notification)
+        notified.append(topic.user_id)
     
+    # Свое сообщение прочитано, хотя оно может быть не на первой странице
+    mark_topic_read(current_user.id, topic_id, post.id)
     db.session.commit()
+    # Подписчикам темы — в фоне, ответ автору не ждет рассылки
+    fanout.submit(post.id, exclude=notified)
     flash('Сообщение добавлено!')
-    return redirect(url_for('forum.view_topic', topic_id=topic_id))
+    # Тема листается постранично: открываем страницу, на которой сообщение показано
+    return redirect(url_for('forum.goto_post', topic_id=topic_id, post_id=post.id))
 
 @forum.route('/post/<int:post_id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -129,9 +215,10 @@ def edit_post(post_id):
             return redirect(url_for('forum.edit_post', post_id=post_id))
         post.content = content
         post.updated_at = datetime.utcnow()
+        posts_changed([post.topic_id])
         db.session.commit()
         flash('Сообщение обновлено!')
-        return redirect(url_for('forum.view_topic', topic_id=post.topic_id))
+        return redirect(url_for('forum.goto_post', topic_id=post.topic_id, post_id=post.id))
     return render_template('forum/edit_post.html', post=post)
 
 @forum.route('/post/<int:post_id>/delete', methods=['POST'])
@@ -143,8 +230,8 @@ def delete_post(post_id):
     if post.user_id != current_user.id:
         abort(403)
     topic_id = post.topic_id
-    db.session.delete(post)
-    db.session.commit()
+    # Вместе с ответами на сообщение, иначе они остаются с parent_id удаленного
+    delete_posts([post_id])
     flash('Сообщение удалено!')
     return redirect(url_for('forum.view_topic', topic_id=topic_id))
 
@@ -169,8 +256,11 @@ def reply_to_post(post_id):
             parent_id=post.id
         )
         db.session.add(reply_post)
+        db.session.flush()  # Нужен id сообщения для уведомления и статистики темы
+        post_added(reply_post)
         
         # Создаем уведомление для автора исходного сообщения
+        notified = []
         if post.user_id != current_user.id:
             notification = Notification(
                 user_id=post.user_id,
@@ -181,10 +271,13 @@ def reply_to_post(post_id):
                 post_id=reply_post.id
             )
             db.session.add(notification)
+            notified.append(post.user_id)
         
+        mark_topic_read(current_user.id, post.topic_id, reply_post.id)
         db.session.commit()
+        fanout.submit(reply_post.id, exclude=notified)
         flash('Ответ добавлен!')
-        return redirect(url_for('forum.view_topic', topic_id=post.topic_id))
+        return redirect(url_for('forum.goto_post', topic_id=post.topic_id, post_id=reply_post.id))
     
     return render_template('forum/reply_to_post.html', post=post)
 
@@ -252,6 +345,21 @@ def my_posts():
         ForumPost.created_at.desc()).paginate(page=page, per_page=20, error_out=False)
     return render_template('forum/my_posts.html', posts=posts)
 
+@forum.route('/search')
+@login_required
+def search():
+    """Полнотекстовый поиск по названиям тем и сообщениям"""
+    q = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    query = build_match_query(q)
+    topics, posts = [], None
+    if query:
+        # Подходящие темы показываются над сообщениями только на первой странице
+        if page == 1:
+            topics = search_topics(query)
+        posts = search_posts(query, page=page)
+    return render_template('forum/search.html', q=q, topics=topics, posts=posts)
+
 @forum.route('/topic/<int:topic_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_topic(topic_id):
@@ -293,14 +401,34 @@ def delete_topic(topic_id):
     if topic.user_id != current_user.id and not current_user.is_admin:
         abort(403)
     
-    # Удаляем все сообщения в теме
-    ForumPost.query.filter_by(topic_id=topic_id).delete()
-    # Удаляем тему
-    db.session.delete(topic)
-    db.session.commit()
+    # Сообщения, уведомления о них и пароль темы удаляются пачками
+    delete_topics([topic_id])
     flash('Тема удалена!')
     return redirect(url_for('forum.index'))
 
+@forum.route('/topic/<int:topic_id>/subscribe', methods=['POST'])
+@login_required
+def subscribe_topic(topic_id):
+    """Подписка на новые сообщения темы"""
+    topic = db.session.get(ForumTopic, topic_id)
+    if topic is None:
+        abort(404)
+    if not check_content_access('topic', topic_id):
+        abort(403)
+    subscribe(current_user.id, topic_id)
+    db.session.commit()
+    flash('Вы подписались на тему')
+    return redirect(url_for('forum.view_topic', topic_id=topic_id))
+
+@forum.route('/topic/<int:topic_id>/unsubscribe', methods=['POST'])
+@login_required
+def unsubscribe_topic(topic_id):
+    """Отписка от темы"""
+    unsubscribe(current_user.id, topic_id)
+    db.session.commit()
+    flash('Вы отписались от темы')
+    return redirect(url_for('forum.view_topic', topic_id=topic_id))
+
 @forum.route('/topic/<int:topic_id>/set-password', methods=['GET', 'POST'])
 @login_required
 def set_topic_password(topic_id):
@@ -0,0 +1,44 @@
+from app import app, db
+from model.db_models import Voting
+from utils.ballot_import import read_ballot_rows, import_ballots
+
+def import_paper_ballots(voting_id, path, dry_run=False):
+    """Импортирует бумажные бюллетени из CSV/XLSX в голосование"""
+    with app.app_context():
+        voting = db.session.get(Voting, voting_id)
+        if voting is None:
+            print(f'❌ Голосование {voting_id} не найдено')
+            return False
+        
+        try:
+            with open(path, 'rb') as stream:
+                rows = read_ballot_rows(stream, path)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            print(f'❌ Не удалось прочитать файл: {e}')
+            return False
+        
+        report = import_ballots(voting, rows, dry_run=dry_run)
+        for row in report['rows']:
+            if row['status'] == 'error':
+                print(f"❌ строка {row['line']:5d} | кв. {row['number']:10s} | {row['message']}")
+        
+        print('-' * 50)
+        print(f"📋 Строк: {len(report['rows'])}, ошибок: {report['errors']}")
+        if report['errors']:
+            print('❌ Голоса не добавлены, исправьте ошибки и повторите импорт')
+            return False
+        if dry_run:
+            print('✅ Проверка пройдена, голоса не записывались (--dry-run)')
+        else:
+            print(f"✅ Добавлено голосов: {report['imported']}")
+        return True
+
+if __name__ == '__main__':
+    import sys
+    
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) == 2:
+        import_paper_ballots(int(args[0]), args[1], dry_run='--dry-run' in sys.argv)
+    else:
+        print('Использование: python import_paper_ballots.py <voting_id> <file.csv|file.xlsx> [--dry-run]')
+        print('\nПример: python import_paper_ballots.py 3 ballots.csv --dry-run')
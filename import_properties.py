@@ -0,0 +1,39 @@
+from app import app
+from utils.property_import import read_property_rows, import_properties
+
+def import_property_registry(path, dry_run=False):
+    """Импортирует реестр квартир из CSV/XLSX"""
+    with app.app_context():
+        try:
+            with open(path, 'rb') as stream:
+                rows = read_property_rows(stream, path)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            print(f'❌ Не удалось прочитать файл: {e}')
+            return False
+        
+        report = import_properties(rows, dry_run=dry_run)
+        for row in report['rows']:
+            if row['status'] == 'error':
+                print(f"❌ строка {row['line']:5d} | кв. {row['number']:10s} | {row['message']}")
+        
+        print('-' * 50)
+        print(f"📋 Строк: {len(report['rows'])}, уже в реестре: {report['skipped']}, ошибок: {report['errors']}")
+        if report['errors']:
+            print('❌ Квартиры не добавлены, исправьте ошибки и повторите импорт')
+            return False
+        if dry_run:
+            print('✅ Проверка пройдена, квартиры не записывались (--dry-run)')
+        else:
+            print(f"✅ Добавлено квартир: {report['imported']}")
+        return True
+
+if __name__ == '__main__':
+    import sys
+    
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) == 1:
+        import_property_registry(args[0], dry_run='--dry-run' in sys.argv)
+    else:
+        print('Использование: python import_properties.py <file.csv|file.xlsx> [--dry-run]')
+        print('\nСтолбцы: улица, дом, подъезд, этаж, номер квартиры, площадь, email владельца')
+        print('Пример: python import_properties.py building_12.csv --dry-run')
@@ -2,6 +2,8 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import set_committed_value
 import re
 
 db = SQLAlchemy()
@@ -183,18 +185,28 @@ class Property(db.Model):
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Поиск квартир дома и сортировка реестра по адресу
+        db.Index('ix_property_address', 'street', 'house_number', 'number'),
+    )
+    
     # Связи
     owner = db.relationship('User', backref=db.backref('properties', lazy=True))
     votes = db.relationship('Vote', backref='property', lazy=True)
     
     def get_full_address(self):
         """Возвращает полный адрес собственности"""
-        address_parts = [f"ул. {self.street}", f"д. {self.house_number}"]
-        if self.entrance:
-            address_parts.append(f"подъезд {self.entrance}")
-        if self.floor:
-            address_parts.append(f"этаж {self.floor}")
-        address_parts.append(f"кв. {self.number}")
+        return self.format_address(self.street, self.house_number, self.entrance, self.floor, self.number)
+    
+    @staticmethod
+    def format_address(street, house_number, entrance, floor, number):
+        """Форматирует адрес из отдельных полей (для выборок без ORM-объектов)"""
+        address_parts = [f"ул. {street}", f"д. {house_number}"]
+        if entrance:
+            address_parts.append(f"подъезд {entrance}")
+        if floor:
+            address_parts.append(f"этаж {floor}")
+        address_parts.append(f"кв. {number}")
         return ", ".join(address_parts)
     
     def __repr__(self):
@@ -212,25 +224,124 @@ class Voting(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Денормализованные счетчики (см. utils/vote_counters.py)
+    votes_count = db.Column(db.Integer, nullable=False, default=0)  # Всего голосов
+    votes_area = db.Column(db.Float, nullable=False, default=0)  # Суммарная площадь проголосовавших, кв.м
+    
+    # Состояние: 'upcoming' -> 'open' -> 'closed', переключается планировщиком
+    # в моменты start_date/end_date (см. utils/voting_scheduler.py)
+    state = db.Column(db.String(20), nullable=False, default='upcoming', index=True)
+    
     # Связи
     creator = db.relationship('User', backref=db.backref('created_votings', lazy=True))
-    options = db.relationship('VotingOption', back_populates='voting', lazy=True, cascade='all, delete-orphan')
+    options = db.relationship('VotingOption', back_populates='voting', lazy=True, cascade='all, delete-orphan', order_by='VotingOption.id')
     votes = db.relationship('Vote', backref='voting', lazy=True, cascade='all, delete-orphan')
     
     def is_open(self):
-        """Проверяет, открыто ли голосование"""
+        """
+        Проверяет, открыто ли голосование. Даты проверяются вместе с state:
+        между end_date и следующим шагом планировщика state еще 'open'.
+        """
         now = datetime.utcnow()
-        return self.start_date <= now <= self.end_date and self.is_active
+        return (self.is_active and self.state != 'closed'
+                and self.start_date <= now <= self.end_date)
+    
+    def is_closed(self):
+        """Проверяет, завершено ли голосование (результаты больше не меняются)"""
+        return self.state == 'closed' or self.end_date < datetime.utcnow()
+    
+    def reset_state(self):
+        """
+        Возвращает голосование в 'upcoming' после изменения дат, если новый период
+        еще не наступил или продлевает завершенное голосование. Открывает и
+        закрывает голосование дальше планировщик.
+        """
+        now = datetime.utcnow()
+        if self.start_date > now or (self.state == 'closed' and self.end_date >= now):
+            self.state = 'upcoming'
     
     def get_results(self):
-        """Получает результаты голосования"""
+        """Получает результаты голосования из счетчиков вариантов ответа"""
+        return self._build_results(
+            (option.id, option.text, option.votes_count or 0) for option in self.options
+        )
+    
+    def calculate_results(self):
+        """Пересчитывает результаты голосования по таблице vote одним агрегирующим запросом"""
+        # LEFT JOIN от вариантов, чтобы варианты без голосов тоже попали в результат
+        rows = db.session.query(
+            VotingOption.id,
+            VotingOption.text,
+            db.func.count(Vote.id)
+        ).outerjoin(
+            Vote, db.and_(Vote.option_id == VotingOption.id, Vote.voting_id == self.id)
+        ).filter(
+            VotingOption.voting_id == self.id
+        ).group_by(
+            VotingOption.id, VotingOption.text
+        ).order_by(VotingOption.id).all()
+        return self._build_results(rows)
+    
+    def get_area_results(self, quorum_percent=50):
+        """
+        Результаты голосования по площади (кв.м) одним агрегатом по vote JOIN property
+        
+        Кворум считается от общей площади всех квартир реестра, решение по варианту —
+        большинством площади проголосовавших.
+        """
+        total_area = db.session.query(
+            db.func.coalesce(db.func.sum(Property.area), 0)
+        ).scalar_subquery()
+        
+        rows = db.session.query(
+            VotingOption.id,
+            VotingOption.text,
+            db.func.count(Property.id),
+            db.func.coalesce(db.func.sum(Property.area), 0),
+            total_area
+        ).outerjoin(
+            Vote, db.and_(Vote.option_id == VotingOption.id, Vote.voting_id == self.id)
+        ).outerjoin(
+            Property, Property.id == Vote.property_id
+        ).filter(
+            VotingOption.voting_id == self.id
+        ).group_by(
+            VotingOption.id, VotingOption.text
+        ).order_by(VotingOption.id).all()
+        
+        registry_area = rows[0][4] if rows else 0
+        voted_area = sum(row[3] for row in rows)
+        
         results = {}
-        total_votes = 0
+        for option_id, text, vote_count, area, _ in rows:
+            results[option_id] = {
+                'text': text,
+                'votes': vote_count,
+                'area': round(area, 2),
+                'area_percentage': round(area / voted_area * 100, 1) if voted_area else 0,
+                'registry_percentage': round(area / registry_area * 100, 1) if registry_area else 0,
+                'majority': voted_area > 0 and area * 2 > voted_area
+            }
         
-        for option in self.options:
-            vote_count = Vote.query.filter_by(voting_id=self.id, option_id=option.id).count()
-            results[option.id] = {
-                'text': option.text,
+        turnout = voted_area / registry_area * 100 if registry_area else 0
+        summary = {
+            'votes': sum(row[2] for row in rows),
+            'voted_area': round(voted_area, 2),
+            'registry_area': round(registry_area, 2),
+            'turnout_percentage': round(turnout, 1),
+            'quorum_percent': quorum_percent,
+            'quorum_reached': registry_area > 0 and turnout > quorum_percent
+        }
+        return results, summary
+    
+    @staticmethod
+    def _build_results(rows):
+        """Формирует словарь результатов из строк (id варианта, текст, число голосов)"""
+        results = {}
+        total_votes = 0
+        for option_id, text, vote_count in rows:
+            results[option_id] = {
+                'text': text,
                 'votes': vote_count,
                 'percentage': 0
             }
@@ -253,6 +364,7 @@ class VotingOption(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String(200), nullable=False)
     voting_id = db.Column(db.Integer, db.ForeignKey('voting.id', ondelete='CASCADE'), nullable=False)
+    votes_count = db.Column(db.Integer, nullable=False, default=0)  # Денормализованный счетчик голосов
     
     # Связи
     voting = db.relationship('Voting', back_populates='options')
@@ -273,9 +385,32 @@ class Vote(db.Model):
     # Связь с вариантом ответа
     option = db.relationship('VotingOption', back_populates='votes')
     
+    __table_args__ = (
+        db.Index('ix_vote_voting_option', 'voting_id', 'option_id'),
+        # Одна квартира — один голос в голосовании
+        db.Index('uq_vote_voting_property', 'voting_id', 'property_id', unique=True),
+        # Keyset-пагинация списков голосов по (voted_at, id) (см. utils/keyset.py)
+        db.Index('ix_vote_voted_at', 'voted_at', 'id'),
+        db.Index('ix_vote_property_voted_at', 'property_id', 'voted_at', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Vote {self.voting_id}:{self.property_id}:{self.option_id}>'
 
+class VotingResultSnapshot(db.Model):
+    """Зафиксированные результаты завершенного голосования"""
+    id = db.Column(db.Integer, primary_key=True)
+    voting_id = db.Column(db.Integer, db.ForeignKey('voting.id', ondelete='CASCADE'), unique=True, nullable=False)
+    data = db.Column(db.Text, nullable=False)  # JSON с итогами, результатами по площади и списком квартир
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Связи
+    voting = db.relationship('Voting', backref=db.backref('result_snapshot', uselist=False, lazy=True,
+                                                          cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<VotingResultSnapshot {self.voting_id}>'
+
 class ForumTopic(db.Model):
     """Тема форума"""
     id = db.Column(db.Integer, primary_key=True)
@@ -284,13 +419,44 @@ class ForumTopic(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
+    # Денормализованная статистика для списка тем (см. utils/forum_stats.py)
+    posts_count = db.Column(db.Integer, nullable=False, default=0)
+    last_post_id = db.Column(db.Integer, nullable=True)
+    last_post_at = db.Column(db.DateTime, nullable=True, index=True)  # Сортировка по активности
+    last_post_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    # Растет при любом изменении сообщений темы; ключ кэша отрисованной ветки
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
     # Связи
-    user = db.relationship('User', backref=db.backref('forum_topics', lazy=True))
+    user = db.relationship('User', foreign_keys=[user_id], backref=db.backref('forum_topics', lazy=True))
+    last_post_user = db.relationship('User', foreign_keys=[last_post_user_id])
     posts = db.relationship('ForumPost', backref='topic', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<ForumTopic {self.title}>'
 
+class ForumTopicRead(db.Model):
+    """Отметка прочтения темы: id последнего сообщения, которое видел пользователь"""
+    # Одна строка на пару (пользователь, тема); составной первичный ключ
+    # служит и индексом для соединения со списком тем
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    topic_id = db.Column(db.Integer, db.ForeignKey('forum_topic.id'), primary_key=True)
+    last_read_post_id = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<ForumTopicRead {self.user_id}:{self.topic_id}>'
+
+class TopicSubscription(db.Model):
+    """Подписка пользователя на новые сообщения темы"""
+    # Первичный ключ начинается с topic_id: рассылка читает подписчиков темы
+    # пачками по возрастанию user_id прямо по нему
+    topic_id = db.Column(db.Integer, db.ForeignKey('forum_topic.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TopicSubscription {self.user_id}:{self.topic_id}>'
+
 class ForumPost(db.Model):
     """Сообщение в теме форума"""
     id = db.Column(db.Integer, primary_key=True)
@@ -300,33 +466,142 @@ class ForumPost(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     topic_id = db.Column(db.Integer, db.ForeignKey('forum_topic.id'), nullable=False)
     parent_id = db.Column(db.Integer, db.ForeignKey('forum_post.id'), nullable=True)
+    # Материализованный путь: id всех предков и самого сообщения, дополненные
+    # нулями, например '0000000012/0000000045/'. Сортировка по path дает порядок
+    # показа ветки, а поддерево сообщения — это диапазон path (см. subtree_range)
+    path = db.Column(db.Text, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_forum_post_topic_path', 'topic_id', 'path'),
+        # Корневые сообщения темы по курсору id и ответы на сообщение
+        db.Index('ix_forum_post_topic_parent', 'topic_id', 'parent_id', 'id'),
+    )
     
     # Связи
     user = db.relationship('User', backref=db.backref('forum_posts', lazy=True))
     replies = db.relationship('ForumPost', backref=db.backref('parent', remote_side=[id]), lazy=True)
     
-    def get_replies_tree(self):
-        """Получает дерево ответов для этого сообщения"""
-        def build_tree(post):
-            tree = {
-                'post': post,
-                'replies': []
-            }
-            for reply in post.replies:
-                tree['replies'].append(build_tree(reply))
-            return tree
-        return build_tree(self)
-    
-    def get_all_replies_count(self):
-        """Получает общее количество ответов (включая вложенные)"""
-        count = len(self.replies)
-        for reply in self.replies:
-            count += reply.get_all_replies_count()
-        return count
+    # Ширина одного сегмента пути
+    PATH_WIDTH = 10
+    
+    # Наибольший уровень вложенности. Каждый уровень удлиняет path всех
+    # вложенных ответов, поэтому без ограничения длинная перепалка двух
+    # пользователей занимает в индексе место, растущее квадратично
+    MAX_DEPTH = 32
+    
+    @classmethod
+    def make_path(cls, parent_path, post_id):
+        """Путь сообщения по пути родителя (None для корневого сообщения)"""
+        return f'{parent_path or ""}{post_id:0{cls.PATH_WIDTH}d}/'
+    
+    @classmethod
+    def reply_parent(cls, parent_id, parent_path):
+        """
+        Родитель, к которому прикрепляется ответ: ответ глубже MAX_DEPTH
+        становится ответом на предка родителя на уровне MAX_DEPTH - 1
+        
+        Returns:
+            tuple: (parent_id, parent_path)
+        """
+        limit = cls.MAX_DEPTH * (cls.PATH_WIDTH + 1)
+        if parent_path and len(parent_path) > limit:
+            parent_path = parent_path[:limit]
+            parent_id = int(parent_path[-cls.PATH_WIDTH - 1:-1])
+        return parent_id, parent_path
+    
+    @property
+    def depth(self):
+        """Уровень вложенности: 0 у корневого сообщения"""
+        return len(self.path) // (self.PATH_WIDTH + 1) - 1 if self.path else 0
+    
+    @staticmethod
+    def path_range(path):
+        """
+        Границы поддерева сообщения с путем path (само сообщение и все
+        вложенные ответы): path >= начало и path < конец. '0' идет сразу
+        за '/', поэтому конец отсекает все пути с этим префиксом.
+        """
+        return path, path[:-1] + '0'
+    
+    def subtree_range(self):
+        """Границы path поддерева этого сообщения (см. path_range)"""
+        return self.path_range(self.path)
     
     def __repr__(self):
         return f'<ForumPost {self.id}>'
 
+@event.listens_for(ForumPost, 'after_insert')
+def _set_forum_post_path(mapper, connection, post):
+    """
+    Заполняет path после вставки, когда id сообщения уже известен. Ответ
+    глубже ForumPost.MAX_DEPTH перецепляется к предку (см. reply_parent)
+    """
+    table = ForumPost.__table__
+    parent_id, parent_path = post.parent_id, None
+    if parent_id:
+        parent_path = connection.execute(
+            db.select(table.c.path).where(table.c.id == parent_id)
+        ).scalar()
+        parent_id, parent_path = ForumPost.reply_parent(parent_id, parent_path)
+    path = ForumPost.make_path(parent_path, post.id)
+    connection.execute(table.update().where(table.c.id == post.id).values(path=path, parent_id=parent_id))
+    # Значения уже в базе: не помечаем атрибуты измененными, чтобы не было второго UPDATE
+    set_committed_value(post, 'path', path)
+    set_committed_value(post, 'parent_id', parent_id)
+
+# Полнотекстовый индекс форума (SQLite FTS5, поиск — utils/forum_search.py).
+# unicode61 приводит к нижнему регистру любые буквы, включая кириллицу, и
+# снимает диакритику латиницы; 'ё' он не трогает, поэтому триггеры пишут
+# в индекс текст с 'ё' -> 'е'. Триггеры срабатывают и на массовые
+# UPDATE/DELETE в обход ORM, так что индекс не расходится с таблицами.
+FORUM_SEARCH_NORMALIZE = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+FORUM_SEARCH_TABLES = (
+    ('forum_topic_fts', 'forum_topic', 'title'),
+    ('forum_post_fts', 'forum_post', 'content'),
+)
+
+def forum_search_ddl():
+    """SQL создания таблиц FTS5 и триггеров синхронизации (идемпотентный)"""
+    statements = []
+    for fts, table, column in FORUM_SEARCH_TABLES:
+        new_value = FORUM_SEARCH_NORMALIZE.format(f'new.{column}')
+        statements += [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{column}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, {new_value}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN "
+            f"UPDATE {fts} SET {column} = {new_value} WHERE rowid = new.id; END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM {fts} WHERE rowid = old.id; END",
+        ]
+    return statements
+
+def forum_search_fill():
+    """SQL полного перестроения индекса по текущим данным таблиц"""
+    statements = []
+    for fts, table, column in FORUM_SEARCH_TABLES:
+        statements += [
+            f"DELETE FROM {fts}",
+            f"INSERT INTO {fts}(rowid, {column}) SELECT id, "
+            f"{FORUM_SEARCH_NORMALIZE.format(column)} FROM {table}",
+        ]
+    return statements
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_forum_search(metadata, connection, **kw):
+    """Создает индекс вместе с таблицами; в существующей базе заполняет его"""
+    if connection.dialect.name != 'sqlite':
+        return
+    existed = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = 'forum_post_fts'"
+    ).scalar()
+    statements = forum_search_ddl()
+    if not existed:
+        statements += forum_search_fill()
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
 class Notification(db.Model):
     """Уведомления для пользователей"""
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,37 @@
+from app import app, db
+from utils.vote_counters import reconcile
+
+def reconcile_vote_counters(fix=False, chunk_size=100):
+    """Сверяет счетчики голосов с таблицей vote и при необходимости исправляет их"""
+    with app.app_context():
+        try:
+            drift = reconcile(chunk_size=chunk_size, fix=fix)
+        except Exception as e:
+            db.session.rollback()
+            print(f'❌ Ошибка: {e}')
+            return False
+        
+        if not drift:
+            print('✅ Счетчики голосов совпадают с таблицей vote')
+            return True
+        
+        print(f'⚠️ Найдено расхождений: {len(drift)}')
+        print('-' * 70)
+        for item in drift:
+            print(f"{item['object']:13s} | {item['id']:6d} | {item['field']:11s} | "
+                  f"сохранено: {item['stored']} | фактически: {item['actual']}")
+        print('-' * 70)
+        if fix:
+            print('✅ Счетчики пересчитаны')
+        else:
+            print('Для исправления запустите: python reconcile_vote_counters.py --fix')
+        return True
+
+if __name__ == '__main__':
+    import sys
+    
+    fix = '--fix' in sys.argv
+    chunk_size = 100
+    if '--chunk' in sys.argv:
+        chunk_size = int(sys.argv[sys.argv.index('--chunk') + 1])
+    reconcile_vote_counters(fix=fix, chunk_size=chunk_size)
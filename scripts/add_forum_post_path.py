@@ -0,0 +1,61 @@
+import sqlite3
+import os
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+# Ширина сегмента пути, как ForumPost.PATH_WIDTH
+PATH_WIDTH = 10
+
+# Наибольший уровень вложенности, как ForumPost.MAX_DEPTH
+MAX_DEPTH = 32
+
+def add_forum_post_path():
+    """Добавляет forum_post.path и заполняет его для существующих сообщений"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA table_info(forum_post);")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'path' not in columns:
+        cursor.execute("ALTER TABLE forum_post ADD COLUMN path TEXT;")
+        print('Столбец forum_post.path добавлен.')
+    
+    # Сообщения, чей родитель удален, становятся корневыми: страница темы
+    # выбирает корни по parent_id IS NULL
+    cursor.execute("""
+        UPDATE forum_post SET parent_id = NULL
+        WHERE parent_id IS NOT NULL
+          AND parent_id NOT IN (SELECT id FROM forum_post);
+    """)
+    if cursor.rowcount:
+        print(f'Ответов на удаленные сообщения сделано корневыми: {cursor.rowcount}')
+    
+    # Пути строятся от корней вниз без рекурсии. Ответ глубже MAX_DEPTH
+    # перецепляется к предку на уровне MAX_DEPTH - 1, как при вставке
+    cursor.execute("SELECT id, parent_id FROM forum_post ORDER BY id;")
+    rows = cursor.fetchall()
+    children = {}
+    for post_id, parent_id in rows:
+        children.setdefault(parent_id, []).append(post_id)
+    
+    limit = MAX_DEPTH * (PATH_WIDTH + 1)
+    paths = []
+    stack = [(post_id, None, '') for post_id in reversed(children.get(None, []))]
+    while stack:
+        post_id, parent_id, parent_path = stack.pop()
+        if len(parent_path) > limit:
+            parent_path = parent_path[:limit]
+            parent_id = int(parent_path[-PATH_WIDTH - 1:-1])
+        path = f'{parent_path}{post_id:0{PATH_WIDTH}d}/'
+        paths.append((path, parent_id, post_id))
+        stack.extend((child_id, post_id, path) for child_id in reversed(children.get(post_id, [])))
+    
+    cursor.executemany("UPDATE forum_post SET path = ?, parent_id = ? WHERE id = ?;", paths)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_forum_post_topic_path ON forum_post (topic_id, path);")
+    conn.commit()
+    print(f'Пути заполнены для {len(paths)} сообщений!')
+    conn.close()
+
+if __name__ == '__main__':
+    add_forum_post_path()
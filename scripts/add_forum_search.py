@@ -0,0 +1,26 @@
+import sqlite3
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from model.db_models import forum_search_ddl, forum_search_fill
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+def add_forum_search():
+    """Создает полнотекстовый индекс форума и заново заполняет его"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    for statement in forum_search_ddl() + forum_search_fill():
+        cursor.execute(statement)
+    cursor.execute("INSERT INTO forum_post_fts(forum_post_fts) VALUES ('optimize');")
+    conn.commit()
+    topics = cursor.execute("SELECT count(*) FROM forum_topic_fts;").fetchone()[0]
+    posts = cursor.execute("SELECT count(*) FROM forum_post_fts;").fetchone()[0]
+    print(f'Индекс поиска построен: тем {topics}, сообщений {posts}!')
+    conn.close()
+
+if __name__ == '__main__':
+    add_forum_search()
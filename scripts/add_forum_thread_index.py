@@ -0,0 +1,17 @@
+import sqlite3
+import os
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+def add_forum_thread_index():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    # Страницы корневых сообщений темы по курсору id и поиск страницы сообщения
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_forum_post_topic_parent ON forum_post (topic_id, parent_id, id);")
+    conn.commit()
+    print('Индекс ix_forum_post_topic_parent создан!')
+    conn.close()
+
+if __name__ == '__main__':
+    add_forum_thread_index()
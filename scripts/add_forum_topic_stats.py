@@ -0,0 +1,42 @@
+import sqlite3
+import os
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+def add_forum_topic_stats():
+    """Добавляет статистику тем форума и заполняет ее по таблице forum_post"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA table_info(forum_topic);")
+    columns = [row[1] for row in cursor.fetchall()]
+    new_columns = {
+        'posts_count': 'INTEGER NOT NULL DEFAULT 0',
+        'last_post_id': 'INTEGER',
+        'last_post_at': 'DATETIME',
+        'last_post_user_id': 'INTEGER REFERENCES user (id)',
+    }
+    for name, definition in new_columns.items():
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE forum_topic ADD COLUMN {name} {definition};")
+            print(f'Столбец forum_topic.{name} добавлен.')
+    
+    # Последним считается сообщение с наибольшим id
+    cursor.execute("""
+        UPDATE forum_topic SET
+            posts_count = (SELECT COUNT(*) FROM forum_post WHERE forum_post.topic_id = forum_topic.id),
+            last_post_id = (SELECT MAX(id) FROM forum_post WHERE forum_post.topic_id = forum_topic.id);
+    """)
+    cursor.execute("""
+        UPDATE forum_topic SET
+            last_post_at = (SELECT created_at FROM forum_post WHERE forum_post.id = forum_topic.last_post_id),
+            last_post_user_id = (SELECT user_id FROM forum_post WHERE forum_post.id = forum_topic.last_post_id);
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_forum_topic_last_post_at ON forum_topic (last_post_at);")
+    conn.commit()
+    print('Статистика тем форума заполнена!')
+    conn.close()
+
+if __name__ == '__main__':
+    add_forum_topic_stats()
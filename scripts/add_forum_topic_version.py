@@ -0,0 +1,23 @@
+import sqlite3
+import os
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+def add_forum_topic_version():
+    """Добавляет forum_topic.version — ключ кэша отрисованной ветки темы"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA table_info(forum_topic);")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'version' not in columns:
+        cursor.execute("ALTER TABLE forum_topic ADD COLUMN version INTEGER NOT NULL DEFAULT 0;")
+        conn.commit()
+        print('Столбец forum_topic.version добавлен!')
+    else:
+        print('Столбец forum_topic.version уже существует.')
+    conn.close()
+
+if __name__ == '__main__':
+    add_forum_topic_version()
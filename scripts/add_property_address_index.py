@@ -0,0 +1,17 @@
+import sqlite3
+import os
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+def add_property_address_index():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    # Составной индекс для поиска квартир дома и сортировки реестра по адресу
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_property_address ON property (street, house_number, number);")
+    conn.commit()
+    print('Индекс ix_property_address создан!')
+    conn.close()
+
+if __name__ == '__main__':
+    add_property_address_index()
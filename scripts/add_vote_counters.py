@@ -0,0 +1,48 @@
+import sqlite3
+import os
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+def add_vote_counters():
+    """Добавляет денормализованные счетчики голосов и заполняет их по таблице vote"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA table_info(voting_option);")
+    option_columns = [row[1] for row in cursor.fetchall()]
+    if 'votes_count' not in option_columns:
+        cursor.execute("ALTER TABLE voting_option ADD COLUMN votes_count INTEGER NOT NULL DEFAULT 0;")
+        print('Столбец voting_option.votes_count добавлен.')
+    
+    cursor.execute("PRAGMA table_info(voting);")
+    voting_columns = [row[1] for row in cursor.fetchall()]
+    if 'votes_count' not in voting_columns:
+        cursor.execute("ALTER TABLE voting ADD COLUMN votes_count INTEGER NOT NULL DEFAULT 0;")
+        print('Столбец voting.votes_count добавлен.')
+    if 'votes_area' not in voting_columns:
+        cursor.execute("ALTER TABLE voting ADD COLUMN votes_area FLOAT NOT NULL DEFAULT 0;")
+        print('Столбец voting.votes_area добавлен.')
+    
+    # Заполняем счетчики по существующим голосам
+    cursor.execute("""
+        UPDATE voting_option SET votes_count = (
+            SELECT COUNT(*) FROM vote
+            WHERE vote.option_id = voting_option.id AND vote.voting_id = voting_option.voting_id
+        );
+    """)
+    cursor.execute("""
+        UPDATE voting SET
+            votes_count = (SELECT COUNT(*) FROM vote WHERE vote.voting_id = voting.id),
+            votes_area = (
+                SELECT COALESCE(SUM(property.area), 0) FROM vote
+                JOIN property ON property.id = vote.property_id
+                WHERE vote.voting_id = voting.id
+            );
+    """)
+    conn.commit()
+    print('Счетчики голосов заполнены!')
+    conn.close()
+
+if __name__ == '__main__':
+    add_vote_counters()
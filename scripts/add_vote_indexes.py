@@ -0,0 +1,42 @@
+import sqlite3
+import os
+import sys
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+def add_vote_indexes(dedupe=False):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    # Индекс для агрегатов по голосованию и варианту ответа
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_vote_voting_option ON vote (voting_id, option_id);")
+    
+    # Перед уникальным индексом ищем повторные голоса одной квартиры
+    cursor.execute("""
+        SELECT voting_id, property_id, COUNT(*) FROM vote
+        GROUP BY voting_id, property_id HAVING COUNT(*) > 1;
+    """)
+    duplicates = cursor.fetchall()
+    if duplicates:
+        print(f'Найдено повторных голосов: {len(duplicates)}')
+        for voting_id, property_id, count in duplicates:
+            print(f'  голосование {voting_id}, квартира {property_id}: {count} голосов')
+        if not dedupe:
+            print('Уникальный индекс не создан. Запустите с --dedupe, чтобы оставить только первый голос.')
+            conn.commit()
+            conn.close()
+            return
+        cursor.execute("""
+            DELETE FROM vote WHERE id NOT IN (
+                SELECT MIN(id) FROM vote GROUP BY voting_id, property_id
+            );
+        """)
+        print(f'Удалено повторных голосов: {cursor.rowcount}. Запустите reconcile_vote_counters.py --fix')
+    
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_vote_voting_property ON vote (voting_id, property_id);")
+    conn.commit()
+    print('Индексы таблицы vote созданы!')
+    conn.close()
+
+if __name__ == '__main__':
+    add_vote_indexes(dedupe='--dedupe' in sys.argv)
@@ -0,0 +1,21 @@
+import sqlite3
+import os
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+def add_vote_keyset_indexes():
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    # Keyset-пагинация списка голосов в админке по (voted_at, id)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_vote_voted_at ON vote (voted_at, id);")
+    # Голоса квартир пользователя на странице "Мои голоса"
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_vote_property_voted_at ON vote (property_id, voted_at, id);")
+    # Голоса без даты не попадут в keyset-страницы
+    cursor.execute("UPDATE vote SET voted_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE voted_at IS NULL;")
+    conn.commit()
+    print('Индексы для постраничного вывода голосов созданы!')
+    conn.close()
+
+if __name__ == '__main__':
+    add_vote_keyset_indexes()
@@ -0,0 +1,35 @@
+import sqlite3
+import os
+from datetime import datetime
+
+# Путь к базе данных (скорее всего instance/app.db)
+db_path = os.path.join(os.path.dirname(__file__), '..', 'instance', 'app.db')
+
+def add_voting_state():
+    """Добавляет столбец voting.state и заполняет его по датам голосований"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA table_info(voting);")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'state' not in columns:
+        cursor.execute("ALTER TABLE voting ADD COLUMN state VARCHAR(20) NOT NULL DEFAULT 'upcoming';")
+        print('Столбец voting.state добавлен.')
+    
+    # Даты хранятся строками в формате SQLAlchemy, сравниваем в том же формате.
+    # Уведомления за уже прошедшие переходы не рассылаются
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')
+    cursor.execute("""
+        UPDATE voting SET state = CASE
+            WHEN end_date < ? THEN 'closed'
+            WHEN start_date <= ? THEN 'open'
+            ELSE 'upcoming'
+        END;
+    """, (now, now))
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_voting_state ON voting (state);")
+    conn.commit()
+    print('Состояния голосований заполнены!')
+    conn.close()
+
+if __name__ == '__main__':
+    add_voting_state()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк показа длинной ветки форума.
+
+Строит в базе в памяти тему с цепочкой ответов заданной длины (хранимая
+глубина ограничена ForumPost.MAX_DEPTH) и случайными ответами вокруг нее,
+затем измеряет: сборку дерева и разворачивание в плоский список, отрисовку
+всей ветки одним циклом шаблона, страницу темы с ограничением глубины
+(load_thread_page) и для сравнения прежний рекурсивный макрос с вложенными
+блоками.
+
+Использование:
+    python scripts/bench_forum_thread.py [количество_сообщений] [глубина_цепочки]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(ROOT)
+
+from flask import Flask, render_template
+from flask_login import LoginManager
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+
+from model.db_models import db, User, ForumTopic, ForumPost
+from utils.forum_tree import build_post_tree, flatten_post_tree, load_thread_page
+from utils.keyset import KeysetPage
+
+# Прежний показ ветки: макрос вызывает себя для каждого уровня ответов
+LEGACY_TEMPLATE = """
+{% macro render_post(node, level=0) %}
+<div class="post" id="post-{{ node.post.id }}" style="margin-left: {{ level * 30 }}px;">
+    <div class="post-content">{{ node.post.content }}</div>
+    {% if node.replies %}
+        <div class="replies">
+            {% for reply in node.replies %}{{ render_post(reply, level + 1) }}{% endfor %}
+        </div>
+    {% endif %}
+</div>
+{% endmacro %}
+{% for node in roots %}{{ render_post(node) }}{% endfor %}
+"""
+
+
+def create_bench_app():
+    """Создает минимальное приложение с базой в памяти и шаблонами форума"""
+    app = Flask(__name__, template_folder=os.path.join(ROOT, 'templates'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = 'bench'
+    db.init_app(app)
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: None)
+
+    from forum import forum
+    app.register_blueprint(forum, url_prefix='/forum')
+    return app
+
+
+def seed(posts_count, chain_depth):
+    """
+    Заполняет тему: цепочка из chain_depth ответов друг на друга, остальные
+    сообщения отвечают на случайное сообщение или открывают новую ветку
+    """
+    users = [User(username=f'bench{i}', email=f'bench{i}@example.com', password_hash='-') for i in range(2)]
+    db.session.add_all(users)
+    db.session.flush()
+    topic = ForumTopic(title='Бенчмарк', user_id=users[0].id)
+    db.session.add(topic)
+    db.session.flush()
+
+    random.seed(1)
+    started = datetime.utcnow() - timedelta(days=1)
+    rows, paths = [], {}
+    for post_id in range(1, posts_count + 1):
+        if post_id == 1:
+            parent_id = None
+        elif post_id <= chain_depth:
+            parent_id = post_id - 1
+        elif random.random() < 0.1:
+            parent_id = None
+        else:
+            parent_id = random.randint(1, post_id - 1)
+        # path заполняется здесь: вставка в обход ORM не вызывает after_insert,
+        # глубина ограничивается так же, как при вставке через ORM
+        parent_id, parent_path = ForumPost.reply_parent(parent_id, paths.get(parent_id))
+        paths[post_id] = ForumPost.make_path(parent_path, post_id)
+        rows.append({
+            'id': post_id,
+            'content': f'Сообщение {post_id}',
+            'user_id': users[post_id % 2].id,
+            'topic_id': topic.id,
+            'parent_id': parent_id,
+            'path': paths[post_id],
+            'created_at': started + timedelta(seconds=post_id),
+        })
+    db.session.execute(insert(ForumPost), rows)
+    db.session.commit()
+    return topic
+
+
+def measure(func, repeat=3):
+    """Возвращает (результат, мс за вызов) или (исключение, None)"""
+    try:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return result, (time.perf_counter() - started) / repeat * 1000
+    except RecursionError as error:
+        return error, None
+
+
+def main():
+    posts_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    chain_depth = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    app = create_bench_app()
+    with app.app_context(), app.test_request_context():
+        db.create_all()
+        topic_id = seed(posts_count, chain_depth).id
+
+        def load_tree():
+            db.session.expunge_all()
+            posts = ForumPost.query.options(joinedload(ForumPost.user)).filter_by(
+                topic_id=topic_id
+            ).order_by(ForumPost.path).all()
+            return build_post_tree(posts)
+
+        roots, tree_ms = measure(load_tree)
+        items, flatten_ms = measure(lambda: flatten_post_tree(roots))
+        html, render_ms = measure(lambda: render_template(
+            'forum/_thread.html', topic=db.session.get(ForumTopic, topic_id), posts=items,
+            page=KeysetPage(items, len(items), False, False, None, None)
+        ))
+        page, page_ms = measure(lambda: load_thread_page(topic_id))
+        legacy, legacy_ms = measure(lambda: app.jinja_env.from_string(LEGACY_TEMPLATE).render(roots=roots))
+
+        deepest = max(item.level for item in items)
+        if len(items) != posts_count or deepest < min(chain_depth - 1, ForumPost.MAX_DEPTH):
+            print("❌ Плоский список не совпадает с деревом!")
+            sys.exit(1)
+
+        print(f"📊 Сообщений: {posts_count}, глубина цепочки: {chain_depth}")
+        print(f"   запрос и сборка дерева:        {tree_ms:.1f} мс")
+        print(f"   плоский список (итеративно):   {flatten_ms:.1f} мс")
+        print(f"   шаблон одним циклом:           {render_ms:.1f} мс, {len(html) // 1024} КБ")
+        print(f"   страница темы (глубина огр.):  {page_ms:.1f} мс, {len(page.items)} сообщений")
+        if legacy_ms is None:
+            print(f"   рекурсивный макрос:            ошибка ({type(legacy).__name__})")
+        else:
+            print(f"   рекурсивный макрос:            {legacy_ms:.1f} мс, {len(legacy) // 1024} КБ")
+
+
+if __name__ == '__main__':
+    main()
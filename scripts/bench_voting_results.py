@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк подсчета результатов голосования.
+
+Сравнивает старый подсчет (один COUNT на каждый вариант ответа) с агрегирующим
+Voting.calculate_results() и чтением счетчиков в Voting.get_results() на временной
+базе в памяти и выводит количество SQL-запросов и время выполнения.
+
+Использование:
+    python scripts/bench_voting_results.py [количество_вариантов] [количество_квартир]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask
+from sqlalchemy import event
+
+from model.db_models import db, User, Property, Voting, VotingOption, Vote
+from utils.vote_counters import recount_voting
+
+
+def create_bench_app():
+    """Создает минимальное приложение с базой в памяти"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(options_count, properties_count):
+    """Заполняет базу тестовым голосованием"""
+    user = User(username='bench', email='bench@example.com', password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    voting = Voting(
+        title='Бенчмарк',
+        description='Бенчмарк',
+        question='Бенчмарк?',
+        start_date=now - timedelta(days=1),
+        end_date=now + timedelta(days=1),
+        created_by=user.id
+    )
+    db.session.add(voting)
+    db.session.flush()
+
+    options = [VotingOption(text=f'Вариант {i}', voting_id=voting.id) for i in range(options_count)]
+    db.session.add_all(options)
+    db.session.flush()
+
+    properties = [
+        Property(number=str(i), area=40 + i % 60, street='Бенчмарк', house_number='1', owner_id=user.id)
+        for i in range(properties_count)
+    ]
+    db.session.add_all(properties)
+    db.session.flush()
+
+    # Последний вариант оставляем без голосов, чтобы проверить LEFT JOIN
+    voted_options = options[:-1] or options
+    db.session.add_all([
+        Vote(voting_id=voting.id, property_id=prop.id, option_id=voted_options[i % len(voted_options)].id)
+        for i, prop in enumerate(properties)
+    ])
+    db.session.flush()
+    recount_voting(voting.id)
+    db.session.commit()
+    return voting
+
+
+def legacy_get_results(voting):
+    """Старая реализация: отдельный COUNT для каждого варианта"""
+    results = {}
+    total_votes = 0
+    for option in voting.options:
+        vote_count = Vote.query.filter_by(voting_id=voting.id, option_id=option.id).count()
+        results[option.id] = {'text': option.text, 'votes': vote_count, 'percentage': 0}
+        total_votes += vote_count
+    if total_votes > 0:
+        for option_id in results:
+            results[option_id]['percentage'] = round(
+                (results[option_id]['votes'] / total_votes) * 100, 1
+            )
+    return results, total_votes
+
+
+def measure(func, voting, repeat=50):
+    """Возвращает (результат, запросов за вызов, мс за вызов)"""
+    statements = []
+
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+    try:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db.session.expire_all()
+            result = func(voting)
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_query)
+    return result, len(statements) / repeat, elapsed / repeat * 1000
+
+
+def main():
+    options_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    properties_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    app = create_bench_app()
+    with app.app_context():
+        db.create_all()
+        voting = seed(options_count, properties_count)
+
+        legacy, legacy_queries, legacy_ms = measure(legacy_get_results, voting)
+        aggregate, aggregate_queries, aggregate_ms = measure(lambda v: v.calculate_results(), voting)
+        counters, counters_queries, counters_ms = measure(lambda v: v.get_results(), voting)
+
+        if not legacy == aggregate == counters:
+            print("❌ Результаты реализаций не совпадают!")
+            sys.exit(1)
+
+        print(f"📊 Вариантов: {options_count}, квартир: {properties_count}")
+        print(f"   COUNT на вариант:  {legacy_queries:.0f} запросов, {legacy_ms:.2f} мс")
+        print(f"   GROUP BY:          {aggregate_queries:.0f} запросов, {aggregate_ms:.2f} мс")
+        print(f"   счетчики:          {counters_queries:.0f} запросов, {counters_ms:.2f} мс")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Импорт бумажных бюллетеней голосования из CSV/XLSX
+"""
+
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from model.db_models import db, Vote, VotingOption, Property
+from utils.vote_counters import add_votes
+from utils.voting_results import invalidate_snapshots
+from utils.table_files import read_table
+
+# Размер пачки для executemany
+BATCH_SIZE = 1000
+
+# Возможные заголовки первого столбца
+HEADER_NAMES = {'номер', 'квартира', 'номер квартиры', '№', 'number', 'property'}
+
+
+def read_ballot_rows(stream, filename):
+    """
+    Читает строки бюллетеней (номер квартиры, текст варианта) из файла
+    
+    Args:
+        stream: Бинарный поток файла
+        filename (str): Имя файла, по расширению выбирается формат
+    
+    Returns:
+        list: Кортежи (номер строки, номер квартиры, текст варианта)
+    
+    Raises:
+        ValueError: Если формат не поддерживается
+    """
+    rows = []
+    for line, cells in read_table(stream, filename, HEADER_NAMES):
+        number = cells[0] if cells else ''
+        option_text = cells[1] if len(cells) > 1 else ''
+        rows.append((line, number, option_text))
+    return rows
+
+
+def import_ballots(voting, rows, dry_run=False):
+    """
+    Проверяет все бюллетени и вставляет голоса пачками.
+    Импорт атомарный: при любой ошибке в файле не добавляется ни один голос.
+    
+    Args:
+        voting (Voting): Голосование
+        rows (list): Кортежи (номер строки, номер квартиры, текст варианта)
+        dry_run (bool): Только проверить, ничего не записывая
+    
+    Returns:
+        dict: Отчет {'rows': [...], 'imported': int, 'errors': int,
+              'totals': {option_id: (голосов, площадь)}}
+    """
+    # Карты поиска: номер квартиры -> (id, площадь), текст варианта -> id
+    properties = {
+        number: (property_id, area)
+        for number, property_id, area in db.session.query(Property.number, Property.id, Property.area)
+    }
+    options = {
+        text.strip().lower(): option_id
+        for option_id, text in db.session.query(VotingOption.id, VotingOption.text).filter_by(voting_id=voting.id)
+    }
+    voted = {
+        row[0] for row in db.session.query(Vote.property_id).filter_by(voting_id=voting.id)
+    }
+    
+    report = []
+    votes = []
+    seen = {}
+    for line, number, option_text in rows:
+        entry = {'line': line, 'number': number, 'option': option_text, 'status': 'ok', 'message': ''}
+        report.append(entry)
+        
+        prop = properties.get(number)
+        option_id = options.get(option_text.lower())
+        if not number:
+            entry['message'] = 'Не указан номер квартиры'
+        elif prop is None:
+            entry['message'] = 'Квартира не найдена'
+        elif option_id is None:
+            entry['message'] = 'Вариант ответа не найден'
+        elif prop[0] in voted:
+            entry['message'] = 'Квартира уже проголосовала'
+        elif number in seen:
+            entry['message'] = f'Повтор строки {seen[number]}'
+        else:
+            seen[number] = line
+            votes.append((prop[0], option_id, prop[1]))
+            continue
+        entry['status'] = 'error'
+    
+    errors = sum(1 for entry in report if entry['status'] == 'error')
+    result = {'rows': report, 'imported': 0, 'errors': errors, 'totals': {}}
+    if errors or dry_run or not votes:
+        return result
+    
+    now = datetime.utcnow()
+    totals = {}
+    try:
+        for start in range(0, len(votes), BATCH_SIZE):
+            batch = votes[start:start + BATCH_SIZE]
+            db.session.execute(insert(Vote), [
+                {
+                    'voting_id': voting.id,
+                    'property_id': property_id,
+                    'option_id': option_id,
+                    'voted_at': now,
+                    'created_at': now
+                }
+                for property_id, option_id, _ in batch
+            ])
+            for _, option_id, area in batch:
+                count, option_area = totals.get(option_id, (0, 0))
+                totals[option_id] = (count + 1, option_area + area)
+        
+        for option_id, (count, area) in totals.items():
+            add_votes(voting.id, option_id, count, area)
+        invalidate_snapshots([voting.id])
+        db.session.commit()
+    except IntegrityError:
+        # Кто-то проголосовал онлайн во время импорта
+        db.session.rollback()
+        conflicts = {
+            row[0] for row in db.session.query(Vote.property_id).filter_by(voting_id=voting.id)
+        }
+        for entry in report:
+            prop = properties.get(entry['number'])
+            if prop and prop[0] in conflicts:
+                entry['status'] = 'error'
+                entry['message'] = 'Квартира уже проголосовала'
+        result['errors'] = sum(1 for entry in report if entry['status'] == 'error')
+        return result
+    
+    result['imported'] = len(votes)
+    result['totals'] = totals
+    return result
@@ -0,0 +1,133 @@
+"""
+Удаление сообщений и тем форума
+
+Сообщение удаляется вместе со всеми ответами: поддерево — это диапазон
+ForumPost.path. Удаление идет несколькими множественными DELETE без загрузки
+объектов в сессию. Сообщения удаляются пачками по CHUNK_SIZE с commit после
+каждой пачки, поэтому удаление большой темы не держит блокировку базы все
+время работы. Пачки идут по убыванию path, то есть ответы удаляются раньше
+сообщений, на которые они отвечают: если удаление прервется, в базе не
+останется ответов без родителя, а повторный вызов доудалит остаток. Вместе с
+сообщениями удаляются уведомления о них, статистика тем пересчитывается.
+"""
+
+from sqlalchemy import select
+
+from model.db_models import db, ForumTopic, ForumTopicRead, TopicSubscription, ForumPost, Notification, ContentPassword, ContentAccess
+from utils.forum_stats import recount_topics
+
+# Сообщений в одной транзакции удаления
+CHUNK_SIZE = 1000
+
+# Типы уведомлений, которые ссылаются на тему (related_id) и сообщение (post_id)
+FORUM_NOTIFICATION_TYPES = ('forum_reply', 'forum_subscription')
+
+
+def _delete_chunks(query):
+    """
+    Удаляет сообщения, выбранные запросом id, пачками с commit после каждой
+
+    Args:
+        query: Запрос ForumPost.id, упорядоченный так, что ответы идут раньше родителей
+
+    Returns:
+        int: Число удаленных сообщений
+    """
+    deleted = 0
+    while True:
+        ids = [row[0] for row in query.limit(CHUNK_SIZE)]
+        if not ids:
+            return deleted
+        ForumPost.query.filter(ForumPost.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+
+
+def _delete_post_notifications(posts_select):
+    """Удаляет уведомления о сообщениях из подзапроса (без commit)"""
+    Notification.query.filter(
+        Notification.type.in_(FORUM_NOTIFICATION_TYPES),
+        Notification.post_id.in_(posts_select)
+    ).delete(synchronize_session=False)
+
+
+def delete_posts(post_ids):
+    """
+    Удаляет сообщения вместе со всеми ответами на них
+
+    Args:
+        post_ids (iterable): ID сообщений; ответы выбранных сообщений
+            могут быть среди них — они удаляются один раз
+
+    Returns:
+        int: Число удаленных сообщений, включая ответы
+    """
+    posts = db.session.query(ForumPost.topic_id, ForumPost.path).filter(
+        ForumPost.id.in_(list(set(post_ids)))
+    ).order_by(ForumPost.topic_id, ForumPost.path).all()
+
+    # Выбранное сообщение внутри уже выбранного поддерева отдельно не удаляется
+    subtrees = []
+    for topic_id, path in posts:
+        if subtrees and subtrees[-1][0] == topic_id and path.startswith(subtrees[-1][1]):
+            continue
+        subtrees.append((topic_id, path))
+
+    deleted = 0
+    for topic_id, path in subtrees:
+        start, end = ForumPost.path_range(path)
+        in_subtree = (
+            ForumPost.topic_id == topic_id,
+            ForumPost.path >= start,
+            ForumPost.path < end
+        )
+        _delete_post_notifications(select(ForumPost.id).where(*in_subtree))
+        deleted += _delete_chunks(
+            db.session.query(ForumPost.id).filter(*in_subtree).order_by(ForumPost.path.desc())
+        )
+
+    recount_topics(topic_id for topic_id, _ in subtrees)
+    db.session.commit()
+    return deleted
+
+
+def delete_topics(topic_ids):
+    """
+    Удаляет темы со всеми сообщениями, уведомлениями, отметками прочтения,
+    подписками и паролями доступа
+
+    Args:
+        topic_ids (iterable): ID тем
+
+    Returns:
+        int: Число удаленных тем
+    """
+    topic_ids = [row[0] for row in db.session.query(ForumTopic.id).filter(
+        ForumTopic.id.in_(list(set(topic_ids)))
+    )]
+    if not topic_ids:
+        return 0
+
+    Notification.query.filter(
+        Notification.type.in_(FORUM_NOTIFICATION_TYPES),
+        Notification.related_id.in_(topic_ids)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    for topic_id in topic_ids:
+        _delete_chunks(
+            db.session.query(ForumPost.id).filter(
+                ForumPost.topic_id == topic_id
+            ).order_by(ForumPost.path.desc())
+        )
+
+    for model in (ForumTopicRead, TopicSubscription):
+        model.query.filter(model.topic_id.in_(topic_ids)).delete(synchronize_session=False)
+    for model in (ContentPassword, ContentAccess):
+        model.query.filter(
+            model.content_type == 'topic',
+            model.content_id.in_(topic_ids)
+        ).delete(synchronize_session=False)
+    ForumTopic.query.filter(ForumTopic.id.in_(topic_ids)).delete(synchronize_session=False)
+    db.session.commit()
+    return len(topic_ids)
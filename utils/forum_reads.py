@@ -0,0 +1,67 @@
+"""
+Отметки прочтения тем форума
+
+Для каждой пары (пользователь, тема) хранится id последнего сообщения, которое
+пользователь видел. Тема непрочитана, если ForumTopic.last_post_id больше
+отметки, поэтому список тем получает признак одним LEFT JOIN по первичному
+ключу ForumTopicRead, без подсчета сообщений.
+"""
+
+from sqlalchemy import and_, literal
+from sqlalchemy.dialects.sqlite import insert
+
+from model.db_models import db, ForumTopic, ForumTopicRead
+
+
+def mark_topic_read(user_id, topic_id, post_id):
+    """
+    Передвигает отметку пользователя до сообщения post_id (без commit).
+    Тема показывается постранично, поэтому передается наибольший id среди
+    сообщений открытой страницы, а не последнее сообщение темы. Отметка
+    не уменьшается; повторный просмотр без новых сообщений ничего не пишет.
+
+    Args:
+        user_id (int): ID пользователя
+        topic_id (int): ID темы
+        post_id (int): Наибольший ID показанного сообщения или None
+
+    Returns:
+        bool: True, если отметка изменилась
+    """
+    if post_id is None:
+        return False
+    current = db.session.query(ForumTopicRead.last_read_post_id).filter_by(
+        user_id=user_id, topic_id=topic_id
+    ).scalar()
+    if current is not None and current >= post_id:
+        return False
+
+    # Отметка только растет, даже если параллельный запрос успел записать большую
+    statement = insert(ForumTopicRead).values(
+        user_id=user_id, topic_id=topic_id, last_read_post_id=post_id
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[ForumTopicRead.user_id, ForumTopicRead.topic_id],
+        set_={'last_read_post_id': statement.excluded.last_read_post_id},
+        where=ForumTopicRead.last_read_post_id < statement.excluded.last_read_post_id
+    ))
+    return True
+
+
+def with_read_marks(query, user):
+    """
+    Добавляет к запросу тем столбец с отметкой прочтения пользователя
+
+    Args:
+        query: Запрос ForumTopic
+        user: current_user; для анонимного пользователя столбец всегда NULL
+
+    Returns:
+        Query: Запрос строк (ForumTopic, last_read_post_id)
+    """
+    if not user.is_authenticated:
+        return query.add_columns(literal(None).label('last_read_post_id'))
+    return query.outerjoin(ForumTopicRead, and_(
+        ForumTopicRead.topic_id == ForumTopic.id,
+        ForumTopicRead.user_id == user.id
+    )).add_columns(ForumTopicRead.last_read_post_id)
@@ -0,0 +1,168 @@
+"""
+Полнотекстовый поиск по форуму
+
+Названия тем и тексты сообщений индексируются таблицами SQLite FTS5
+forum_topic_fts и forum_post_fts (схема и триггеры — в model/db_models.py).
+Результаты упорядочены по bm25, совпадения подсвечены, сообщения
+постранично. Запрос пользователя разбирается на слова и превращается в
+префиксные термы, поэтому разные формы русского слова находят друг друга
+без отдельного стеммера.
+"""
+
+import re
+
+from flask_sqlalchemy.pagination import Pagination
+from markupsafe import Markup, escape
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import joinedload
+
+from model.db_models import db, ForumTopic, ForumPost, ContentPassword
+from utils.content_password import check_content_access
+
+# Сколько слов запроса учитывается
+MAX_TERMS = 8
+
+# Тем, показываемых над списком сообщений
+TOPICS_LIMIT = 5
+
+# Метки подсветки: символы из области частного использования не встречаются
+# в тексте и не меняются при экранировании HTML
+MARK_OPEN = '\ue000'
+MARK_CLOSE = '\ue001'
+
+# Окончания, отбрасываемые у длинных слов перед префиксным поиском
+ENDINGS = set('аеийоуыьэюя')
+
+WORD_RE = re.compile(r'\w+')
+
+TOPICS_SQL = text(
+    "SELECT rowid, highlight(forum_topic_fts, 0, :open, :close) "
+    "FROM forum_topic_fts WHERE forum_topic_fts MATCH :query "
+    "ORDER BY rank LIMIT :limit"
+)
+# Сообщения тем, закрытых паролем для пользователя, исключаются в самом
+# запросе: иначе число найденных и заголовки выдают содержимое темы
+POSTS_WHERE = (
+    "WHERE forum_post_fts MATCH :query "
+    "AND rowid NOT IN (SELECT id FROM forum_post WHERE topic_id IN :locked) "
+)
+POSTS_SQL = text(
+    "SELECT rowid, snippet(forum_post_fts, 0, :open, :close, '…', 24) "
+    "FROM forum_post_fts " + POSTS_WHERE +
+    "ORDER BY rank LIMIT :limit OFFSET :offset"
+).bindparams(bindparam('locked', expanding=True))
+POSTS_COUNT_SQL = text(
+    "SELECT count(*) FROM forum_post_fts " + POSTS_WHERE
+).bindparams(bindparam('locked', expanding=True))
+
+
+def build_match_query(raw):
+    """
+    Превращает строку пользователя в выражение MATCH
+
+    Каждое слово становится префиксным термом в кавычках, так что операторы
+    FTS5 и спецсимволы из ввода не интерпретируются. У слов длиннее четырех
+    букв отбрасывается гласная на конце: 'собрание' ищется как 'собрани*'
+    и находит 'собрания', 'собранию'.
+
+    Args:
+        raw (str): Строка поиска
+
+    Returns:
+        str: Выражение для MATCH или '' если в строке нет слов
+    """
+    terms = []
+    for word in WORD_RE.findall((raw or '').lower().replace('ё', 'е')):
+        if len(word) > 4 and word[-1] in ENDINGS:
+            word = word[:-1]
+        if word not in terms:
+            terms.append(word)
+    return ' '.join(f'"{term}"*' for term in terms[:MAX_TERMS])
+
+
+def _highlight(fragment):
+    """Экранирует фрагмент и превращает метки совпадений в <mark>"""
+    return Markup(str(escape(fragment))
+                  .replace(MARK_OPEN, '<mark>')
+                  .replace(MARK_CLOSE, '</mark>'))
+
+
+def _locked_topics():
+    """ID тем, закрытых паролем, к которым у текущего пользователя нет доступа"""
+    protected = [row[0] for row in db.session.query(ContentPassword.content_id).filter(
+        ContentPassword.content_type == 'topic',
+        ContentPassword.is_active.is_(True)
+    )]
+    return [topic_id for topic_id in protected if not check_content_access('topic', topic_id)]
+
+
+class SearchHit:
+    """Найденная тема или сообщение с подсвеченным фрагментом"""
+    __slots__ = ('item', 'fragment')
+
+    def __init__(self, item, fragment):
+        self.item = item
+        self.fragment = fragment
+
+
+def search_topics(query, limit=TOPICS_LIMIT):
+    """
+    Темы, название которых подходит под запрос
+
+    Args:
+        query (str): Выражение MATCH из build_match_query
+        limit (int): Сколько тем вернуть
+
+    Returns:
+        list: SearchHit с ForumTopic, лучшие первыми
+    """
+    rows = db.session.execute(TOPICS_SQL, {
+        'query': query, 'open': MARK_OPEN, 'close': MARK_CLOSE, 'limit': limit
+    }).all()
+    topics = {topic.id: topic for topic in ForumTopic.query.options(
+        joinedload(ForumTopic.user)
+    ).filter(ForumTopic.id.in_([row[0] for row in rows]))}
+    # Название закрытой темы видно и в общем списке тем, поэтому не скрывается
+    return [SearchHit(topics[topic_id], _highlight(fragment))
+            for topic_id, fragment in rows if topic_id in topics]
+
+
+class SearchPagination(Pagination):
+    """
+    Страница найденных сообщений. Как и paginate() у запросов, дает items,
+    total, pages, has_prev/has_next и iter_pages() для шаблона.
+    """
+
+    def _query_items(self):
+        rows = db.session.execute(POSTS_SQL, {
+            'query': self._query_args['query'], 'locked': self._query_args['locked'],
+            'open': MARK_OPEN, 'close': MARK_CLOSE,
+            'limit': self.per_page, 'offset': self._query_offset
+        }).all()
+        posts = {post.id: post for post in ForumPost.query.options(
+            joinedload(ForumPost.user), joinedload(ForumPost.topic)
+        ).filter(ForumPost.id.in_([row[0] for row in rows]))}
+        return [SearchHit(posts[post_id], _highlight(fragment))
+                for post_id, fragment in rows if post_id in posts]
+
+    def _query_count(self):
+        return db.session.execute(POSTS_COUNT_SQL, {
+            'query': self._query_args['query'], 'locked': self._query_args['locked']
+        }).scalar()
+
+
+def search_posts(query, page=1, per_page=20):
+    """
+    Сообщения, подходящие под запрос, одной страницей. Сообщения тем,
+    закрытых паролем для текущего пользователя, не ищутся.
+
+    Args:
+        query (str): Выражение MATCH из build_match_query
+        page (int): Номер страницы
+        per_page (int): Сообщений на странице
+
+    Returns:
+        SearchPagination: items — SearchHit с ForumPost
+    """
+    return SearchPagination(page=page, per_page=per_page, error_out=False,
+                            query=query, locked=_locked_topics())
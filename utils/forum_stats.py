@@ -0,0 +1,77 @@
+"""
+Денормализованная статистика тем форума
+
+ForumTopic хранит число сообщений и данные последнего сообщения, чтобы список
+тем не считал их запросом на каждую тему. Добавление сообщения меняет
+счетчики одним UPDATE-выражением, после удаления статистика пересчитывается
+по таблице forum_post. Каждое изменение сообщений темы увеличивает
+ForumTopic.version, по которой кэшируется отрисованная ветка.
+"""
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+
+from model.db_models import ForumTopic, ForumPost
+
+
+def post_added(post):
+    """
+    Учитывает новое сообщение в статистике темы (без commit).
+    Вызывать после flush, когда у сообщения есть id и created_at.
+    
+    Args:
+        post (ForumPost): Добавленное сообщение
+    """
+    ForumTopic.query.filter_by(id=post.topic_id).update({
+        ForumTopic.posts_count: ForumTopic.posts_count + 1,
+        ForumTopic.last_post_id: post.id,
+        ForumTopic.last_post_at: post.created_at,
+        ForumTopic.last_post_user_id: post.user_id,
+        ForumTopic.version: ForumTopic.version + 1
+    }, synchronize_session=False)
+
+
+def posts_changed(topic_ids):
+    """
+    Отмечает, что сообщения тем изменились без изменения статистики,
+    например отредактирован текст (без commit)
+    
+    Args:
+        topic_ids (iterable): ID тем
+    """
+    topic_ids = list(set(topic_ids))
+    if topic_ids:
+        ForumTopic.query.filter(ForumTopic.id.in_(topic_ids)).update({
+            ForumTopic.version: ForumTopic.version + 1
+        }, synchronize_session=False)
+
+
+def recount_topics(topic_ids):
+    """
+    Пересчитывает статистику тем по таблице forum_post одним UPDATE (без commit)
+    
+    Args:
+        topic_ids (iterable): ID тем
+    """
+    topic_ids = list(set(topic_ids))
+    if not topic_ids:
+        return
+    
+    # Последним считается сообщение с наибольшим id: id растут вместе с created_at
+    last_post_id = select(func.max(ForumPost.id)).where(
+        ForumPost.topic_id == ForumTopic.id
+    ).correlate(ForumTopic).scalar_subquery()
+    last_post = aliased(ForumPost)
+    ForumTopic.query.filter(ForumTopic.id.in_(topic_ids)).update({
+        ForumTopic.posts_count: select(func.count(ForumPost.id)).where(
+            ForumPost.topic_id == ForumTopic.id
+        ).scalar_subquery(),
+        ForumTopic.last_post_id: last_post_id,
+        ForumTopic.last_post_at: select(last_post.created_at).where(
+            last_post.id == last_post_id
+        ).scalar_subquery(),
+        ForumTopic.last_post_user_id: select(last_post.user_id).where(
+            last_post.id == last_post_id
+        ).scalar_subquery(),
+        ForumTopic.version: ForumTopic.version + 1
+    }, synchronize_session=False)
@@ -0,0 +1,139 @@
+"""
+Подписки на темы форума и рассылка уведомлений подписчикам
+
+Новое сообщение не рассылается в обработчике запроса: он только ставит
+задачу в очередь, а фоновый поток вставляет уведомления подписчикам
+пачками по BATCH_SIZE — один INSERT на пачку, подписчики читаются по
+первичному ключу TopicSubscription по курсору user_id. Поэтому ответ в теме
+с тысячами подписчиков возвращается автору сразу. Очередь хранится в памяти
+процесса: задачи, не выполненные до остановки процесса, теряются.
+"""
+
+import queue
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from model.db_models import db, ForumPost, ForumTopic, TopicSubscription, User, Notification
+
+# Подписчиков в одной пачке (один INSERT и один commit)
+BATCH_SIZE = 500
+
+
+def subscribe(user_id, topic_id):
+    """Подписывает пользователя на тему; повторная подписка ничего не меняет (без commit)"""
+    db.session.execute(sqlite_insert(TopicSubscription).values(
+        topic_id=topic_id, user_id=user_id, created_at=datetime.utcnow()
+    ).on_conflict_do_nothing())
+
+
+def unsubscribe(user_id, topic_id):
+    """Отменяет подписку пользователя на тему (без commit)"""
+    TopicSubscription.query.filter_by(topic_id=topic_id, user_id=user_id).delete(synchronize_session=False)
+
+
+def is_subscribed(user_id, topic_id):
+    """Подписан ли пользователь на тему (поиск по первичному ключу)"""
+    return db.session.get(TopicSubscription, (topic_id, user_id)) is not None
+
+
+def fan_out(post_id, exclude=()):
+    """
+    Создает уведомления о сообщении всем подписчикам темы, кроме автора
+    и пользователей из exclude. Коммитит после каждой пачки.
+
+    Args:
+        post_id (int): ID нового сообщения
+        exclude (iterable): ID пользователей, уже уведомленных иначе
+
+    Returns:
+        int: Число созданных уведомлений
+    """
+    row = db.session.query(ForumPost.topic_id, ForumPost.user_id, ForumTopic.title, User.username).join(
+        ForumTopic, ForumTopic.id == ForumPost.topic_id
+    ).join(User, User.id == ForumPost.user_id).filter(ForumPost.id == post_id).first()
+    if row is None:
+        return 0
+    topic_id, author_id, topic_title, username = row
+    skip = set(exclude) | {author_id}
+
+    title = f'Новое сообщение в теме "{topic_title}"'[:200]
+    message = f'{username} написал в теме, на которую вы подписаны'
+    created = 0
+    last_user_id = 0
+    while True:
+        user_ids = [user_id for (user_id,) in db.session.query(TopicSubscription.user_id).filter(
+            TopicSubscription.topic_id == topic_id,
+            TopicSubscription.user_id > last_user_id
+        ).order_by(TopicSubscription.user_id).limit(BATCH_SIZE)]
+        if not user_ids:
+            return created
+        last_user_id = user_ids[-1]
+
+        now = datetime.utcnow()
+        rows = [{
+            'user_id': user_id,
+            'title': title,
+            'message': message,
+            'type': 'forum_subscription',
+            'related_id': topic_id,
+            'post_id': post_id,
+            'is_read': False,
+            'created_at': now,
+        } for user_id in user_ids if user_id not in skip]
+        if rows:
+            db.session.execute(insert(Notification), rows)
+            db.session.commit()
+            created += len(rows)
+
+
+class NotificationFanout:
+    """Фоновый поток, рассылающий уведомления подписчикам тем"""
+
+    def __init__(self):
+        self.app = None
+        self.background = True
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        """Без фонового потока (FORUM_FANOUT_BACKGROUND = False) рассылка идет сразу в запросе"""
+        self.app = app
+        self.background = app.config.get('FORUM_FANOUT_BACKGROUND', True)
+
+    def submit(self, post_id, exclude=()):
+        """
+        Ставит рассылку о новом сообщении в очередь. Вызывать после commit,
+        чтобы поток увидел сообщение.
+        """
+        if not self.background:
+            fan_out(post_id, exclude)
+            return
+        self._start()
+        self._queue.put((post_id, tuple(exclude)))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='forum-fanout', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            post_id, exclude = self._queue.get()
+            with self.app.app_context():
+                try:
+                    fan_out(post_id, exclude)
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Ошибка рассылки уведомлений подписчикам')
+                finally:
+                    db.session.remove()
+            self._queue.task_done()
+
+
+fanout = NotificationFanout()
@@ -0,0 +1,250 @@
+"""
+Дерево сообщений темы форума, собранное в памяти
+
+Сообщения страницы темы и их авторы читаются одним запросом в порядке
+материализованного пути (ForumPost.path), дерево по parent_id строится
+за один проход, поэтому шаблон не вызывает ленивых загрузок post.replies
+и post.user. Корневые сообщения листаются по курсору, ветки глубже
+THREAD_DEPTH свернуты и догружаются фрагментом. Для показа дерево
+разворачивается без рекурсии в плоский список с уровнями, и шаблон выводит
+его одним циклом, поэтому глубина цепочки ответов не ограничена стеком
+Python или Jinja, а отступ ограничен MAX_INDENT.
+"""
+
+from sqlalchemy.orm import joinedload
+
+from model.db_models import db, ForumPost
+from utils.keyset import KeysetPage
+
+
+# Корневых сообщений на странице темы
+THREAD_PAGE_SIZE = 20
+
+# Уровней ответов, показываемых сразу; глубже ветка свернута и догружается
+THREAD_DEPTH = 4
+
+# Наибольший отступ в уровнях; глубже ответы идут с тем же отступом
+MAX_INDENT = 8
+
+
+class PostNode:
+    """
+    Узел дерева: сообщение, прямые ответы, число всех загруженных вложенных
+    ответов и число прямых ответов, скрытых за границей глубины (hidden_count)
+    """
+    __slots__ = ('post', 'replies', 'replies_count', 'hidden_count')
+
+    def __init__(self, post):
+        self.post = post
+        self.replies = []
+        self.replies_count = 0
+        self.hidden_count = 0
+
+
+def build_post_tree(posts, hidden=None):
+    """
+    Собирает дерево из списка сообщений за O(n)
+
+    Args:
+        posts (list): Сообщения темы в порядке показа (по path)
+        hidden (dict): id сообщения -> число скрытых (не загруженных) ответов
+
+    Returns:
+        list: Корневые узлы PostNode. Сообщения, чей родитель не найден
+              (например, удален), показываются как корневые.
+    """
+    nodes = {post.id: PostNode(post) for post in posts}
+    roots = []
+    order = []
+    for post in posts:
+        node = nodes[post.id]
+        if hidden:
+            node.hidden_count = hidden.get(post.id, 0)
+        parent = nodes.get(post.parent_id) if post.parent_id else None
+        if parent is None:
+            roots.append(node)
+        else:
+            parent.replies.append(node)
+        order.append((node, parent))
+
+    # Счетчики вложенных ответов: родитель всегда идет раньше ответа, поэтому
+    # обратный проход поднимает итоги снизу вверх без рекурсии
+    for node, parent in reversed(order):
+        if parent is not None:
+            parent.replies_count += node.replies_count + 1
+    return roots
+
+
+class ThreadItem:
+    """
+    Строка плоского списка ветки: узел, его уровень и родительский узел
+    (None у верхнего уровня списка)
+    """
+    __slots__ = ('node', 'level', 'parent')
+
+    def __init__(self, node, level, parent):
+        self.node = node
+        self.level = level
+        self.parent = parent
+
+    @property
+    def indent(self):
+        """Уровень отступа с ограничением MAX_INDENT"""
+        return min(self.level, MAX_INDENT)
+
+
+def flatten_post_tree(roots, level=0, parent=None):
+    """
+    Разворачивает дерево в список в порядке показа: ответы идут сразу за
+    сообщением, на которое отвечают. Обход с явным стеком, без рекурсии.
+
+    Args:
+        roots (list): Узлы PostNode верхнего уровня
+        level (int): Уровень узлов roots
+        parent (PostNode): Узел, ответами на который являются roots
+
+    Returns:
+        list: Строки ThreadItem
+    """
+    items = []
+    stack = [(node, level, parent) for node in reversed(roots)]
+    while stack:
+        node, node_level, node_parent = stack.pop()
+        items.append(ThreadItem(node, node_level, node_parent))
+        stack.extend((reply, node_level + 1, node) for reply in reversed(node.replies))
+    return items
+
+
+def _segments_length(depth):
+    """Длина path сообщения на уровне depth (0 — корневое)"""
+    return (depth + 1) * (ForumPost.PATH_WIDTH + 1)
+
+
+def _load_range(topic_id, start, end, max_depth):
+    """
+    Читает сообщения диапазона path не глубже max_depth и подписывает
+    узлам на границе глубины число скрытых прямых ответов
+
+    Returns:
+        list: Корневые узлы PostNode диапазона
+    """
+    boundary = _segments_length(max_depth)
+    in_range = (
+        ForumPost.topic_id == topic_id,
+        ForumPost.path >= start,
+        ForumPost.path < end
+    )
+    posts = ForumPost.query.options(
+        joinedload(ForumPost.user)
+    ).filter(*in_range).filter(
+        db.func.length(ForumPost.path) <= boundary
+    ).order_by(ForumPost.path).all()
+
+    # Ответы на сообщения на границе глубины считаются по индексу
+    # (topic_id, parent_id, id): длинные пути глубоких цепочек не читаются
+    edge = [post.id for post in posts if len(post.path) == boundary]
+    hidden = {}
+    if edge:
+        hidden = dict(db.session.query(ForumPost.parent_id, db.func.count(ForumPost.id)).filter(
+            ForumPost.topic_id == topic_id,
+            ForumPost.parent_id.in_(edge)
+        ).group_by(ForumPost.parent_id))
+
+    return build_post_tree(posts, hidden)
+
+
+def parse_thread_cursor(after, before):
+    """
+    Разбирает курсоры страницы ветки из строки запроса
+
+    Args:
+        after (str): Значение параметра after
+        before (str): Значение параметра before (не учитывается вместе с after)
+
+    Returns:
+        tuple: (after, before) — числа или None для отсутствующих и неверных значений
+    """
+    after = int(after) if after and after.isdigit() else None
+    before = int(before) if before and before.isdigit() and after is None else None
+    return after, before
+
+
+def load_thread_page(topic_id, after=None, before=None, per_page=THREAD_PAGE_SIZE, depth=THREAD_DEPTH):
+    """
+    Страница ветки темы: корневые сообщения по курсору id и их ответы до
+    глубины depth. Все ответы страницы лежат в одном непрерывном диапазоне
+    path, поэтому читаются одним запросом.
+
+    Args:
+        topic_id (int): ID темы
+        after (int): id последнего корневого сообщения предыдущей страницы
+        before (int): id первого корневого сообщения следующей страницы
+        per_page (int): Корневых сообщений на странице
+        depth (int): Уровней ответов без сворачивания
+
+    Returns:
+        KeysetPage: items — строки ThreadItem корневых сообщений и ответов
+    """
+    query = db.session.query(ForumPost.id, ForumPost.path).filter(
+        ForumPost.topic_id == topic_id,
+        ForumPost.parent_id.is_(None)
+    )
+    if before is not None:
+        rows = query.filter(ForumPost.id < before).order_by(ForumPost.id.desc()).limit(per_page + 1).all()
+        more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_prev, has_next = more, True
+    else:
+        if after is not None:
+            query = query.filter(ForumPost.id > after)
+        rows = query.order_by(ForumPost.id).limit(per_page + 1).all()
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev, has_next = after is not None, more
+
+    roots = []
+    if rows:
+        start = rows[0].path
+        _, end = ForumPost.path_range(rows[-1].path)
+        roots = [node for node in _load_range(topic_id, start, end, depth) if node.post.parent_id is None]
+
+    return KeysetPage(
+        flatten_post_tree(roots), per_page, has_next, has_prev,
+        next_cursor=str(rows[-1].id) if rows and has_next else None,
+        prev_cursor=str(rows[0].id) if rows and has_prev else None
+    )
+
+
+def load_replies(post, depth=THREAD_DEPTH):
+    """
+    Ответы на сообщение для догрузки свернутой ветки: следующие depth уровней
+
+    Returns:
+        list: Строки ThreadItem ответов на post в порядке показа
+    """
+    start, end = post.subtree_range()
+    roots = _load_range(post.topic_id, start, end, post.depth + depth)
+    if not roots:
+        return []
+    return flatten_post_tree(roots[0].replies, post.depth + 1, roots[0])
+
+
+def thread_cursor_for(post, per_page=THREAD_PAGE_SIZE):
+    """
+    Курсор страницы, на которой показано сообщение. Корень ветки берется
+    из path, его позиция — счетом по индексу (topic_id, parent_id, id).
+
+    Returns:
+        str: Значение after или None для первой страницы
+    """
+    root_id = int(post.path[:ForumPost.PATH_WIDTH]) if post.path else post.id
+    roots = db.session.query(ForumPost.id).filter(
+        ForumPost.topic_id == post.topic_id,
+        ForumPost.parent_id.is_(None)
+    )
+    position = roots.filter(ForumPost.id < root_id).count()
+    page_start = position - position % per_page
+    if page_start == 0:
+        return None
+    previous = roots.order_by(ForumPost.id).offset(page_start - 1).limit(1).scalar()
+    return str(previous)
@@ -0,0 +1,61 @@
+"""
+Кэш отрисованных HTML-фрагментов и других готовых данных в памяти процесса
+
+Ключ фрагмента включает версию данных (например, ForumTopic.version), поэтому
+после изменения старые записи не читаются и просто вытесняются по LRU. Версия
+хранится в базе, так что процессы с собственным кэшем не расходятся между
+собой. Срок жизни записи ограничивает устаревание от изменений, которые версию
+не меняют (например, переименование автора).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """LRU-кэш фрагментов с ограничением по числу записей и по времени жизни"""
+
+    def __init__(self, max_entries=256, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns:
+            Сохраненный фрагмент или None, если его нет или он устарел
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Сохраняет фрагмент, вытесняя самый давно использованный"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Удаляет фрагмент, если он есть"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Отрисованные страницы веток форума: ключ (topic_id, version, after, before),
+# значение (html, наибольший id показанного сообщения)
+forum_threads = FragmentCache()
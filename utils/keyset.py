@@ -0,0 +1,105 @@
+"""
+Keyset-пагинация по паре (время, id)
+
+Вместо OFFSET страница выбирается условием (column, id) < (значение, id)
+последней строки предыдущей страницы, поэтому любая страница стоит столько
+же, сколько первая, если есть индекс по (column, id).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+# Формат времени в курсоре
+CURSOR_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_cursor(value, row_id):
+    """Курсор строки для ссылки на соседнюю страницу"""
+    return f'{value.strftime(CURSOR_FORMAT)}_{row_id}'
+
+
+def decode_cursor(cursor):
+    """
+    Разбирает курсор из запроса
+
+    Returns:
+        tuple: (datetime, id) или None, если курсор пустой или испорчен
+    """
+    if not cursor:
+        return None
+    value, _, row_id = cursor.rpartition('_')
+    try:
+        return datetime.strptime(value, CURSOR_FORMAT), int(row_id)
+    except ValueError:
+        return None
+
+
+class KeysetPage:
+    """Страница keyset-пагинации: items, соседние курсоры и необязательный total"""
+
+    def __init__(self, items, per_page, has_next, has_prev, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+
+def keyset_paginate(query, column, id_column, per_page=20, after=None, before=None,
+                    descending=True, key=None, total=None):
+    """
+    Выбирает одну страницу запроса по курсору
+
+    Args:
+        query: Запрос без ORDER BY и LIMIT
+        column: Столбец времени, по которому идет сортировка
+        id_column: Первичный ключ для однозначного порядка
+        per_page (int): Строк на странице
+        after (str): Курсор — страница после этой строки (вперед)
+        before (str): Курсор — страница перед этой строкой (назад)
+        descending (bool): Новые строки первыми
+        key: Функция строка -> (время, id) для курсора; по умолчанию
+            берутся атрибуты column.key и id_column.key
+        total (int): Общее число строк, если вызывающий может его дать дешево
+
+    Returns:
+        KeysetPage: Страница
+    """
+    if key is None:
+        def key(row):
+            return getattr(row, column.key), getattr(row, id_column.key)
+
+    position = decode_cursor(after) or decode_cursor(before)
+    backwards = position is not None and decode_cursor(after) is None
+    row_key = tuple_(column, id_column)
+
+    if position is not None:
+        # Назад по убыванию — то же, что вперед по возрастанию
+        if descending != backwards:
+            query = query.filter(row_key < tuple_(*position))
+        else:
+            query = query.filter(row_key > tuple_(*position))
+
+    if descending != backwards:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    # Лишняя строка показывает, есть ли еще страница в направлении выборки
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if backwards:
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, position is not None
+
+    next_cursor = encode_cursor(*key(rows[-1])) if rows and has_next else None
+    prev_cursor = encode_cursor(*key(rows[0])) if rows and has_prev else None
+    return KeysetPage(rows, per_page, has_next, has_prev, next_cursor, prev_cursor, total)
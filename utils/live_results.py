@@ -0,0 +1,94 @@
+"""
+Живые результаты голосований: внутрипроцессный pub/sub для Server-Sent Events
+
+Издатель (submit_vote, импорт бюллетеней, удаление голосов в админ-панели)
+публикует приращения голосов (при удалении — отрицательные),
+брокер копит их и рассылает всем подписчикам голосования не чаще
+одного раза в interval секунд.
+"""
+
+import queue
+import threading
+import time
+
+
+class ResultsBroker:
+    """Раздача приращений результатов голосований подписчикам SSE"""
+    
+    def __init__(self, interval=1.0, queue_size=100):
+        self.interval = interval
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = {}  # voting_id -> множество очередей
+        self._pending = {}  # voting_id -> накопленное приращение
+        self._timers = {}  # voting_id -> запланированная рассылка
+        self._last_sent = {}  # voting_id -> время последней рассылки
+    
+    def subscribe(self, voting_id):
+        """
+        Подписывает на приращения голосования
+        
+        Returns:
+            queue.Queue: Очередь, в которую будут приходить приращения
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(voting_id, set()).add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, voting_id, subscriber):
+        """Отписывает очередь от голосования"""
+        with self._lock:
+            subscribers = self._subscribers.get(voting_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[voting_id]
+    
+    def publish(self, voting_id, option_id, votes, area):
+        """
+        Публикует приращение после коммита голосов. Приращения, пришедшие
+        в пределах interval, объединяются в одно сообщение.
+        
+        Args:
+            voting_id (int): ID голосования
+            option_id (int): ID варианта ответа
+            votes (int): Количество добавленных голосов (отрицательное при удалении)
+            area (float): Площадь проголосовавших квартир
+        """
+        with self._lock:
+            if voting_id not in self._subscribers:
+                return
+            
+            pending = self._pending.setdefault(voting_id, {'options': {}, 'votes': 0, 'area': 0})
+            pending['options'][option_id] = pending['options'].get(option_id, 0) + votes
+            pending['votes'] += votes
+            pending['area'] += area or 0
+            
+            if voting_id in self._timers:
+                return
+            delay = max(0, self._last_sent.get(voting_id, 0) + self.interval - time.monotonic())
+            timer = threading.Timer(delay, self._flush, args=(voting_id,))
+            timer.daemon = True
+            self._timers[voting_id] = timer
+        timer.start()
+    
+    def _flush(self, voting_id):
+        """Рассылает накопленное приращение всем подписчикам голосования"""
+        with self._lock:
+            self._timers.pop(voting_id, None)
+            delta = self._pending.pop(voting_id, None)
+            self._last_sent[voting_id] = time.monotonic()
+            subscribers = list(self._subscribers.get(voting_id, ()))
+        
+        if delta is None:
+            return
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(delta)
+            except queue.Full:
+                # Медленный клиент: пропускаем, он переподключится и получит свежие данные
+                pass
+
+
+broker = ResultsBroker()
@@ -0,0 +1,54 @@
+"""
+Квартиры текущего пользователя и его голоса в рамках одного запроса
+
+ID квартир загружаются одним запросом и кэшируются в flask.g, а проверка
+"голосовал ли пользователь" делается одним запросом IN (...) на голосование,
+независимо от количества квартир.
+"""
+
+from flask import g
+from flask_login import current_user
+
+from model.db_models import db, Vote, Property
+
+
+def my_property_ids():
+    """
+    Возвращает ID квартир текущего пользователя (кэш на время запроса)
+    
+    Returns:
+        list: ID квартир, пустой список для анонимного пользователя
+    """
+    if not current_user.is_authenticated:
+        return []
+    if 'my_property_ids' not in g:
+        g.my_property_ids = [
+            row[0] for row in db.session.query(Property.id).filter_by(owner_id=current_user.id)
+        ]
+    return g.my_property_ids
+
+
+def my_vote(voting_id):
+    """
+    Возвращает голос любой из квартир текущего пользователя в голосовании
+    
+    Args:
+        voting_id (int): ID голосования
+    
+    Returns:
+        Vote: Первый голос пользователя или None
+    """
+    cache = g.setdefault('my_votes', {})
+    if voting_id not in cache:
+        property_ids = my_property_ids()
+        cache[voting_id] = db.session.query(Vote).filter(
+            Vote.voting_id == voting_id,
+            Vote.property_id.in_(property_ids)
+        ).order_by(Vote.id).first() if property_ids else None
+    return cache[voting_id]
+
+
+def has_voted(voting_id):
+    """Проверяет, голосовала ли хотя бы одна квартира текущего пользователя"""
+    return my_vote(voting_id) is not None
+
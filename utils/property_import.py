@@ -0,0 +1,191 @@
+"""
+Массовый импорт реестра собственности из CSV/XLSX
+"""
+
+from datetime import datetime
+
+from sqlalchemy import insert, func
+from sqlalchemy.exc import IntegrityError
+
+from model.db_models import db, Property, User
+from utils.table_files import read_table
+
+# Размер пачки для executemany и для списков IN (...)
+BATCH_SIZE = 1000
+
+# Возможные заголовки первого столбца
+HEADER_NAMES = {'улица', 'название улицы', 'street'}
+
+# Порядок столбцов в файле
+COLUMNS = ('street', 'house_number', 'entrance', 'floor', 'number', 'area', 'owner_email')
+
+
+def read_property_rows(stream, filename):
+    """
+    Читает строки реестра из файла
+
+    Args:
+        stream: Бинарный поток файла
+        filename (str): Имя файла, по расширению выбирается формат
+
+    Returns:
+        list: Кортежи (номер строки, словарь полей из COLUMNS)
+
+    Raises:
+        ValueError: Если формат не поддерживается
+    """
+    rows = []
+    for line, cells in read_table(stream, filename, HEADER_NAMES):
+        cells = cells + [''] * (len(COLUMNS) - len(cells))
+        rows.append((line, dict(zip(COLUMNS, cells))))
+    return rows
+
+
+def _parse_row(fields):
+    """
+    Проверяет поля строки и приводит типы
+
+    Returns:
+        tuple: (значения для вставки или None, сообщение об ошибке)
+    """
+    if not all(fields[name] for name in ('street', 'house_number', 'number', 'area', 'owner_email')):
+        return None, 'Не заполнены обязательные поля'
+    if len(fields['number']) > 20 or len(fields['house_number']) > 20 or len(fields['entrance']) > 10:
+        return None, 'Слишком длинное значение'
+
+    try:
+        area = float(fields['area'].replace(',', '.'))
+    except ValueError:
+        return None, 'Площадь должна быть числом'
+    if area <= 0:
+        return None, 'Площадь должна быть больше нуля'
+
+    floor = None
+    if fields['floor']:
+        try:
+            floor = int(fields['floor'])
+        except ValueError:
+            return None, 'Этаж должен быть целым числом'
+
+    return {
+        'street': fields['street'],
+        'house_number': fields['house_number'],
+        'entrance': fields['entrance'] or None,
+        'floor': floor or None,
+        'number': fields['number'],
+        'area': area,
+    }, ''
+
+
+def _existing_numbers(numbers):
+    """Возвращает {номер: (улица, дом)} для уже занятых номеров квартир"""
+    numbers = list(numbers)
+    taken = {}
+    for start in range(0, len(numbers), BATCH_SIZE):
+        chunk = numbers[start:start + BATCH_SIZE]
+        taken.update(
+            (number, (street, house_number))
+            for number, street, house_number in db.session.query(
+                Property.number, Property.street, Property.house_number
+            ).filter(Property.number.in_(chunk))
+        )
+    return taken
+
+
+def import_properties(rows, dry_run=False):
+    """
+    Проверяет строки реестра и вставляет квартиры пачками.
+    Квартиры, которые уже есть в реестре по тому же адресу, пропускаются,
+    поэтому файл можно загружать повторно. Импорт атомарный: при любой
+    ошибке в файле не добавляется ни одна квартира.
+
+    Args:
+        rows (list): Кортежи (номер строки, словарь полей)
+        dry_run (bool): Только проверить, ничего не записывая
+
+    Returns:
+        dict: Отчет {'rows': [...], 'imported': int, 'skipped': int, 'errors': int}
+    """
+    # Владельцы ищутся одним запросом по всем email из файла
+    emails = {fields['owner_email'].lower() for _, fields in rows if fields['owner_email']}
+    owners = {}
+    if emails:
+        owners = {
+            email.lower(): user_id
+            for user_id, email in db.session.query(User.id, User.email).filter(
+                func.lower(User.email).in_(emails)
+            )
+        }
+
+    # Уже зарегистрированные квартиры каждого дома из файла (по индексу ix_property_address)
+    buildings = {(fields['street'], fields['house_number']) for _, fields in rows}
+    registered = set()
+    for street, house_number in buildings:
+        registered.update(
+            (street, house_number, number)
+            for (number,) in db.session.query(Property.number).filter(
+                Property.street == street,
+                Property.house_number == house_number
+            )
+        )
+
+    report = []
+    parsed = []
+    seen = {}
+    for line, fields in rows:
+        entry = dict(fields, line=line, status='ok', message='')
+        report.append(entry)
+
+        values, message = _parse_row(fields)
+        owner_id = owners.get(fields['owner_email'].lower())
+        if values is None:
+            entry['message'] = message
+        elif owner_id is None:
+            entry['message'] = 'Пользователь с таким email не найден'
+        elif fields['number'] in seen:
+            entry['message'] = f'Повтор номера в строке {seen[fields["number"]]}'
+        elif (values['street'], values['house_number'], values['number']) in registered:
+            seen[fields['number']] = line
+            entry['status'] = 'skip'
+            entry['message'] = 'Уже есть в реестре'
+            continue
+        else:
+            seen[fields['number']] = line
+            values['owner_id'] = owner_id
+            parsed.append((entry, values))
+            continue
+        entry['status'] = 'error'
+
+    # Номер квартиры уникален во всем реестре, а не только в доме
+    taken = _existing_numbers(values['number'] for _, values in parsed)
+    for entry, values in parsed:
+        if values['number'] in taken:
+            street, house_number = taken[values['number']]
+            entry['status'] = 'error'
+            entry['message'] = f'Номер уже занят: ул. {street}, д. {house_number}'
+
+    errors = sum(1 for entry in report if entry['status'] == 'error')
+    skipped = sum(1 for entry in report if entry['status'] == 'skip')
+    result = {'rows': report, 'imported': 0, 'skipped': skipped, 'errors': errors}
+    if errors or dry_run or not parsed:
+        return result
+
+    now = datetime.utcnow()
+    properties = [dict(values, created_at=now) for _, values in parsed]
+    try:
+        for start in range(0, len(properties), BATCH_SIZE):
+            db.session.execute(insert(Property), properties[start:start + BATCH_SIZE])
+        db.session.commit()
+    except IntegrityError:
+        # Номер заняли параллельно с импортом
+        db.session.rollback()
+        taken = _existing_numbers(values['number'] for _, values in parsed)
+        for entry, values in parsed:
+            if values['number'] in taken:
+                entry['status'] = 'error'
+                entry['message'] = 'Номер уже занят'
+        result['errors'] = sum(1 for entry in report if entry['status'] == 'error')
+        return result
+
+    result['imported'] = len(properties)
+    return result
@@ -0,0 +1,64 @@
+"""
+Чтение табличных файлов (CSV/XLSX) для импорта
+"""
+
+import csv
+import io
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # openpyxl нужен только для XLSX
+    load_workbook = None
+
+
+def _normalize(value):
+    """Приводит значение ячейки к строке без лишних пробелов"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def read_table(stream, filename, header_names=()):
+    """
+    Читает непустые строки таблицы из CSV или XLSX
+    
+    Args:
+        stream: Бинарный поток файла
+        filename (str): Имя файла, по расширению выбирается формат
+        header_names: Значения первой ячейки, по которым первая строка
+            считается заголовком и пропускается
+    
+    Returns:
+        list: Кортежи (номер строки, список ячеек-строк)
+    
+    Raises:
+        ValueError: Если формат не поддерживается
+    """
+    if filename.lower().endswith('.xlsx'):
+        if load_workbook is None:
+            raise ValueError('Для импорта XLSX установите пакет openpyxl')
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        raw_rows = workbook.active.iter_rows(values_only=True)
+    elif filename.lower().endswith('.csv'):
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+        except csv.Error:
+            dialect = csv.excel
+        raw_rows = csv.reader(text, dialect)
+    else:
+        raise ValueError('Поддерживаются только файлы .csv и .xlsx')
+    
+    rows = []
+    for line, raw in enumerate(raw_rows, start=1):
+        cells = [_normalize(cell) for cell in (raw or ())]
+        if not any(cells):
+            continue
+        if line == 1 and cells[0].lower() in header_names:
+            continue
+        rows.append((line, cells))
+    return rows
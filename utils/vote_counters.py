@@ -0,0 +1,179 @@
+"""
+Денормализованные счетчики голосов
+
+Счетчики хранятся в VotingOption.votes_count, Voting.votes_count и Voting.votes_area
+и обновляются в той же транзакции, что и вставка/удаление строк Vote.
+Функция reconcile() пересчитывает их по сырым данным и сообщает о расхождениях.
+"""
+
+from sqlalchemy import select
+
+from model.db_models import db, Voting, VotingOption, Vote, Property
+
+
+def add_votes(voting_id, option_id, count, area):
+    """
+    Увеличивает счетчики после вставки голосов (без commit)
+    
+    Args:
+        voting_id (int): ID голосования
+        option_id (int): ID варианта ответа
+        count (int): Количество добавленных голосов
+        area (float): Суммарная площадь проголосовавших квартир
+    """
+    if not count:
+        return
+    db.session.query(VotingOption).filter_by(id=option_id).update(
+        {VotingOption.votes_count: VotingOption.votes_count + count},
+        synchronize_session=False
+    )
+    db.session.query(Voting).filter_by(id=voting_id).update(
+        {
+            Voting.votes_count: Voting.votes_count + count,
+            Voting.votes_area: Voting.votes_area + (area or 0)
+        },
+        synchronize_session=False
+    )
+
+
+def remove_votes(vote_ids):
+    """
+    Уменьшает счетчики для голосов, которые будут удалены (без commit).
+    Вызывается до удаления строк Vote.
+    
+    Args:
+        vote_ids (list): ID удаляемых голосов
+    
+    Returns:
+        list: Снятые приращения (voting_id, option_id, голосов, площадь) по вариантам
+    """
+    if not vote_ids:
+        return []
+    
+    rows = db.session.query(
+        Vote.voting_id,
+        Vote.option_id,
+        db.func.count(Vote.id),
+        db.func.coalesce(db.func.sum(Property.area), 0)
+    ).outerjoin(Property, Property.id == Vote.property_id).filter(
+        Vote.id.in_(vote_ids)
+    ).group_by(Vote.voting_id, Vote.option_id).all()
+    
+    for voting_id, option_id, count, area in rows:
+        add_votes(voting_id, option_id, -count, -area)
+    return [tuple(row) for row in rows]
+
+
+def change_property_area(property_id, delta):
+    """
+    Переносит изменение площади квартиры в Voting.votes_area всех голосований,
+    в которых она уже проголосовала (без commit)
+    
+    Args:
+        property_id (int): ID квартиры
+        delta (float): Новая площадь минус старая
+    """
+    if not delta:
+        return
+    voted_in = select(Vote.voting_id).where(Vote.property_id == property_id)
+    db.session.query(Voting).filter(Voting.id.in_(voted_in)).update(
+        {Voting.votes_area: Voting.votes_area + delta},
+        synchronize_session=False
+    )
+
+
+def _calculate(voting_ids):
+    """Считает фактические значения счетчиков по таблице vote для набора голосований"""
+    option_counts = dict(db.session.query(
+        VotingOption.id, db.func.count(Vote.id)
+    ).outerjoin(
+        Vote, db.and_(Vote.option_id == VotingOption.id, Vote.voting_id == VotingOption.voting_id)
+    ).filter(
+        VotingOption.voting_id.in_(voting_ids)
+    ).group_by(VotingOption.id).all())
+    
+    voting_totals = {
+        voting_id: (count, area)
+        for voting_id, count, area in db.session.query(
+            Vote.voting_id,
+            db.func.count(Vote.id),
+            db.func.coalesce(db.func.sum(Property.area), 0)
+        ).outerjoin(Property, Property.id == Vote.property_id).filter(
+            Vote.voting_id.in_(voting_ids)
+        ).group_by(Vote.voting_id).all()
+    }
+    return option_counts, voting_totals
+
+
+def recount_voting(voting_id):
+    """
+    Пересчитывает счетчики одного голосования по таблице vote (без commit)
+    
+    Args:
+        voting_id (int): ID голосования
+    """
+    option_counts, voting_totals = _calculate([voting_id])
+    _store([voting_id], option_counts, voting_totals)
+
+
+def _store(voting_ids, option_counts, voting_totals):
+    """Записывает посчитанные значения в счетчики"""
+    for option_id, count in option_counts.items():
+        db.session.query(VotingOption).filter_by(id=option_id).update(
+            {VotingOption.votes_count: count}, synchronize_session=False
+        )
+    for voting_id in voting_ids:
+        count, area = voting_totals.get(voting_id, (0, 0))
+        db.session.query(Voting).filter_by(id=voting_id).update(
+            {Voting.votes_count: count, Voting.votes_area: area}, synchronize_session=False
+        )
+
+
+def reconcile(chunk_size=100, fix=False):
+    """
+    Сверяет счетчики с сырыми строками Vote, обходя голосования пачками
+    
+    Args:
+        chunk_size (int): Количество голосований в одной пачке
+        fix (bool): Исправлять ли найденные расхождения
+    
+    Returns:
+        list: Расхождения в виде словарей (объект, id, поле, сохранено, фактически)
+    """
+    drift = []
+    last_id = 0
+    
+    while True:
+        votings = db.session.query(
+            Voting.id, Voting.votes_count, Voting.votes_area
+        ).filter(Voting.id > last_id).order_by(Voting.id).limit(chunk_size).all()
+        if not votings:
+            break
+        last_id = votings[-1][0]
+        voting_ids = [row[0] for row in votings]
+        
+        option_counts, voting_totals = _calculate(voting_ids)
+        
+        for voting_id, stored_count, stored_area in votings:
+            actual_count, actual_area = voting_totals.get(voting_id, (0, 0))
+            if (stored_count or 0) != actual_count:
+                drift.append({'object': 'voting', 'id': voting_id, 'field': 'votes_count',
+                              'stored': stored_count, 'actual': actual_count})
+            if abs((stored_area or 0) - actual_area) > 1e-6:
+                drift.append({'object': 'voting', 'id': voting_id, 'field': 'votes_area',
+                              'stored': stored_area, 'actual': actual_area})
+        
+        options = db.session.query(VotingOption.id, VotingOption.votes_count).filter(
+            VotingOption.voting_id.in_(voting_ids)
+        ).all()
+        for option_id, stored_count in options:
+            actual_count = option_counts.get(option_id, 0)
+            if (stored_count or 0) != actual_count:
+                drift.append({'object': 'voting_option', 'id': option_id, 'field': 'votes_count',
+                              'stored': stored_count, 'actual': actual_count})
+        
+        if fix:
+            _store(voting_ids, option_counts, voting_totals)
+            db.session.commit()
+    
+    return drift
@@ -0,0 +1,92 @@
+"""
+Подача голосов одним INSERT с защитой уникальным индексом (voting_id, property_id)
+"""
+
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from model.db_models import db, Vote, VotingOption, Property
+from utils.vote_counters import add_votes
+
+
+# Сколько номеров квартир перечислять в сообщении о повторном голосовании:
+# сообщение хранится в cookie сессии, размер которой ограничен 4 КБ
+CONFLICT_NUMBERS_SHOWN = 10
+
+
+class VoteConflict(Exception):
+    """Часть квартир уже проголосовала в этом голосовании"""
+    
+    def __init__(self, property_numbers):
+        self.property_numbers = property_numbers
+        shown = ', '.join(property_numbers[:CONFLICT_NUMBERS_SHOWN])
+        rest = len(property_numbers) - CONFLICT_NUMBERS_SHOWN
+        super().__init__(f'{shown} и ещё {rest}' if rest > 0 else shown)
+
+
+def voted_property_numbers(voting_id, property_ids):
+    """
+    Возвращает номера квартир из списка, которые уже голосовали (один запрос IN)
+    
+    Args:
+        voting_id (int): ID голосования
+        property_ids (list): ID квартир
+    
+    Returns:
+        list: Номера квартир
+    """
+    if not property_ids:
+        return []
+    rows = db.session.query(Property.number).join(
+        Vote, Vote.property_id == Property.id
+    ).filter(
+        Vote.voting_id == voting_id,
+        Vote.property_id.in_(property_ids)
+    ).order_by(Property.number).all()
+    return [row[0] for row in rows]
+
+
+def cast_votes(voting_id, option_id, properties):
+    """
+    Вставляет голоса всех квартир одним многострочным INSERT и обновляет счетчики.
+    Оператор атомарен: при конфликте с уникальным индексом не вставляется ни один голос.
+    
+    Args:
+        voting_id (int): ID голосования
+        option_id (int): ID варианта ответа (уже проверенный)
+        properties (list): Строки (id, number, area) квартир голосующего
+    
+    Returns:
+        int: Количество вставленных голосов
+    
+    Raises:
+        VoteConflict: Если часть квартир уже проголосовала
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            'voting_id': voting_id,
+            'property_id': property_id,
+            'option_id': option_id,
+            'voted_at': now,
+            'created_at': now
+        }
+        for property_id, _, _ in properties
+    ]
+    try:
+        db.session.execute(insert(Vote).values(rows))
+        add_votes(voting_id, option_id, len(rows), sum(area for _, _, area in properties))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise VoteConflict(voted_property_numbers(voting_id, [row['property_id'] for row in rows]))
+    return len(rows)
+
+
+def find_option(voting_id, option_id):
+    """Возвращает вариант ответа, если он принадлежит голосованию"""
+    if option_id is None:
+        return None
+    return db.session.query(VotingOption).filter_by(id=option_id, voting_id=voting_id).first()
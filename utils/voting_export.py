@@ -0,0 +1,83 @@
+"""
+Потоковая выгрузка поименных результатов голосования в CSV/XLSX
+"""
+
+import csv
+import io
+
+from model.db_models import Property
+from utils.voting_results import property_votes_query
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # openpyxl нужен только для XLSX
+    Workbook = None
+
+# Сколько строк забирать из курсора за раз
+CHUNK_SIZE = 1000
+
+HEADER = ['Номер квартиры', 'Адрес', 'Владелец', 'Площадь, кв.м', 'Вариант ответа']
+
+
+def iter_export_rows(voting_id, chunk_size=CHUNK_SIZE):
+    """
+    Построчно отдает результаты голосования, читая курсор пачками (yield_per)
+    
+    Args:
+        voting_id (int): ID голосования
+        chunk_size (int): Размер пачки курсора
+    
+    Yields:
+        list: Номер, адрес, владелец, площадь, вариант
+    """
+    for row in property_votes_query(voting_id).yield_per(chunk_size):
+        yield [
+            row.number,
+            Property.format_address(row.street, row.house_number, row.entrance, row.floor, row.number),
+            row.owner,
+            row.area,
+            row.vote
+        ]
+
+
+def iter_csv(voting_id, chunk_size=CHUNK_SIZE):
+    """
+    Отдает CSV кусками по chunk_size строк (для потокового HTTP-ответа или файла)
+    
+    Yields:
+        bytes: Очередной кусок CSV в UTF-8 с BOM (для Excel)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    writer.writerow(HEADER)
+    
+    for index, row in enumerate(iter_export_rows(voting_id, chunk_size), start=1):
+        writer.writerow(row)
+        if index % chunk_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(voting_id, fileobj, chunk_size=CHUNK_SIZE):
+    """
+    Пишет XLSX в файл в режиме write_only: строки сбрасываются на диск по мере записи
+    
+    Args:
+        voting_id (int): ID голосования
+        fileobj: Файл или путь для сохранения
+    
+    Raises:
+        ValueError: Если не установлен openpyxl
+    """
+    if Workbook is None:
+        raise ValueError('Для выгрузки XLSX установите пакет openpyxl')
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Результаты')
+    sheet.append(HEADER)
+    for row in iter_export_rows(voting_id, chunk_size):
+        sheet.append(row)
+    workbook.save(fileobj)
@@ -0,0 +1,33 @@
+"""
+Списки голосований без N+1: автор, число вариантов, голосов и статус в одном запросе
+"""
+
+from sqlalchemy import and_, case, func, select
+
+from model.db_models import db, Voting, VotingOption, User
+
+
+def voting_list_query():
+    """
+    Строит запрос списка голосований. Каждая строка содержит объект Voting
+    и вычисленные в SQL поля, поэтому шаблону не нужны ленивые загрузки.
+    
+    Returns:
+        Query: Строки (Voting, creator_name, options_count, votes_count, status),
+               где status — 'open', 'upcoming', 'closed' или 'inactive'
+    """
+    options_count = select(func.count(VotingOption.id)).where(
+        VotingOption.voting_id == Voting.id
+    ).correlate(Voting).scalar_subquery()
+    # Состояние ведет планировщик; отключенное открытое голосование показывается как 'inactive'
+    status = case(
+        (and_(Voting.state == 'open', Voting.is_active.is_(False)), 'inactive'),
+        else_=Voting.state
+    )
+    return db.session.query(
+        Voting,
+        User.username.label('creator_name'),
+        options_count.label('options_count'),
+        Voting.votes_count.label('votes_count'),
+        status.label('status')
+    ).join(User, User.id == Voting.created_by)
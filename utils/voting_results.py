@@ -0,0 +1,229 @@
+"""
+Утилиты для выборки результатов голосования
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from model.db_models import db, Vote, VotingOption, Property, User, VotingResultSnapshot
+from utils.fragment_cache import FragmentCache
+
+
+def property_votes_query(voting_id, owner_id=None):
+    """
+    Строит один запрос со списком проголосовавших квартир голосования.
+    Возвращает плоские строки, а не ORM-объекты, поэтому не порождает
+    ленивых загрузок vote.option и property.owner.
+    
+    Args:
+        voting_id (int): ID голосования
+        owner_id (int): Если указан, только квартиры этого владельца
+    
+    Returns:
+        Query: Запрос со столбцами property_id, owner_id, number, area, street, house_number,
+               entrance, floor, owner, vote
+    """
+    query = db.session.query(
+        Property.id.label('property_id'),
+        Property.owner_id,
+        Property.number,
+        Property.area,
+        Property.street,
+        Property.house_number,
+        Property.entrance,
+        Property.floor,
+        User.username.label('owner'),
+        VotingOption.text.label('vote')
+    ).select_from(Vote).join(
+        Property, Property.id == Vote.property_id
+    ).join(
+        User, User.id == Property.owner_id
+    ).join(
+        VotingOption, VotingOption.id == Vote.option_id
+    ).filter(Vote.voting_id == voting_id)
+    
+    if owner_id is not None:
+        query = query.filter(Property.owner_id == owner_id)
+    
+    return query.order_by(Property.street, Property.house_number, Property.number)
+
+
+# Интервалы ряда явки: формат strftime для группировки и шаг между точками
+TURNOUT_BUCKETS = {
+    'hour': ('%Y-%m-%d %H:00', timedelta(hours=1)),
+    'day': ('%Y-%m-%d', timedelta(days=1)),
+}
+
+
+def turnout_series(voting_id, bucket='hour'):
+    """
+    Строит ряд явки голосования одним агрегирующим запросом с группировкой
+    по часу или дню Vote.voted_at. Интервалы без голосов между первым и
+    последним голосом добавляются с нулями, чтобы график был непрерывным.
+    
+    Args:
+        voting_id (int): ID голосования
+        bucket (str): 'hour' или 'day'
+    
+    Returns:
+        list: Точки {'bucket', 'votes', 'area', 'total_votes', 'total_area'},
+              где total_* — накопленные значения
+    """
+    fmt, step = TURNOUT_BUCKETS[bucket]
+    bucket_expr = func.strftime(fmt, Vote.voted_at)
+    rows = db.session.query(
+        bucket_expr,
+        func.count(Vote.id),
+        func.coalesce(func.sum(Property.area), 0)
+    ).select_from(Vote).join(
+        Property, Property.id == Vote.property_id
+    ).filter(
+        Vote.voting_id == voting_id
+    ).group_by(bucket_expr).order_by(bucket_expr).all()
+    
+    series = []
+    total_votes, total_area = 0, 0
+    counts = {key: (votes, area) for key, votes, area in rows if key}
+    if not counts:
+        return series
+    moment = datetime.strptime(min(counts), fmt)
+    last = datetime.strptime(max(counts), fmt)
+    while moment <= last:
+        key = moment.strftime(fmt)
+        votes, area = counts.get(key, (0, 0))
+        total_votes += votes
+        total_area += area
+        series.append({
+            'bucket': key,
+            'votes': votes,
+            'area': round(area, 2),
+            'total_votes': total_votes,
+            'total_area': round(total_area, 2)
+        })
+        moment += step
+    return series
+
+
+class ListPagination(Pagination):
+    """Постраничный вывод готового списка с тем же интерфейсом, что и у paginate()"""
+    
+    def _query_items(self):
+        rows = self._query_args['rows']
+        return rows[self._query_offset:self._query_offset + self.per_page]
+    
+    def _query_count(self):
+        return len(self._query_args['rows'])
+
+
+# Разобранные снимки текущего процесса: voting_id -> ((id, created_at) снимка, данные).
+# Снимок со списком квартир занимает мегабайты, поэтому в памяти держатся только
+# недавно открытые; вытесненный снова читается из VotingResultSnapshot
+_snapshot_cache = FragmentCache(max_entries=16, ttl=3600)
+
+
+def build_snapshot_data(voting):
+    """
+    Считает полные результаты голосования по таблице vote
+    
+    Args:
+        voting (Voting): Голосование
+    
+    Returns:
+        dict: Итоги, результаты по вариантам и площади, список проголосовавших квартир,
+              ряды явки по часам и дням
+    """
+    results, total_votes = voting.calculate_results()
+    area_results, area_summary = voting.get_area_results(current_app.config['VOTING_QUORUM_PERCENT'])
+    properties = [
+        {
+            'owner_id': row.owner_id,
+            'number': row.number,
+            'area': row.area,
+            'street': row.street,
+            'house_number': row.house_number,
+            'entrance': row.entrance,
+            'floor': row.floor,
+            'owner': row.owner,
+            'vote': row.vote
+        }
+        for row in property_votes_query(voting.id)
+    ]
+    return {
+        # Ключи-числа не переживают JSON, поэтому варианты храним списком пар
+        'results': list(results.items()),
+        'total_votes': total_votes,
+        'area_results': list(area_results.items()),
+        'area_summary': area_summary,
+        'properties': properties,
+        'turnout': {bucket: turnout_series(voting.id, bucket) for bucket in TURNOUT_BUCKETS}
+    }
+
+
+def _load(snapshot):
+    data = json.loads(snapshot.data)
+    data['results'] = dict(data['results'])
+    data['area_results'] = dict(data['area_results'])
+    return data
+
+
+def get_snapshot(voting):
+    """
+    Возвращает зафиксированные результаты завершенного голосования.
+    Снимок записывается один раз при первом обращении после окончания голосования.
+    
+    Args:
+        voting (Voting): Голосование
+    
+    Returns:
+        dict: Данные снимка или None, если голосование еще не завершено
+    """
+    if not voting.is_closed():
+        return None
+    
+    # Проверяем по (id, created_at): после удаления снимка SQLite может выдать тот же id
+    key = db.session.query(
+        VotingResultSnapshot.id, VotingResultSnapshot.created_at
+    ).filter_by(voting_id=voting.id).first()
+    if key is not None:
+        cached = _snapshot_cache.get(voting.id)
+        if cached and cached[0] == tuple(key):
+            return cached[1]
+        snapshot = db.session.get(VotingResultSnapshot, key[0])
+    else:
+        snapshot = VotingResultSnapshot(
+            voting_id=voting.id,
+            data=json.dumps(build_snapshot_data(voting), ensure_ascii=False)
+        )
+        db.session.add(snapshot)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Снимок уже записан параллельным запросом
+            db.session.rollback()
+            snapshot = VotingResultSnapshot.query.filter_by(voting_id=voting.id).first()
+    
+    data = _load(snapshot)
+    _snapshot_cache.set(voting.id, ((snapshot.id, snapshot.created_at), data))
+    return data
+
+
+def invalidate_snapshots(voting_ids):
+    """
+    Удаляет снимки результатов голосований (без commit)
+    
+    Args:
+        voting_ids (iterable): ID голосований
+    """
+    voting_ids = list(voting_ids)
+    if not voting_ids:
+        return
+    VotingResultSnapshot.query.filter(
+        VotingResultSnapshot.voting_id.in_(voting_ids)
+    ).delete(synchronize_session=False)
+    for voting_id in voting_ids:
+        _snapshot_cache.delete(voting_id)
@@ -0,0 +1,183 @@
+"""
+Планировщик жизненного цикла голосований
+
+Фоновый поток просыпается в ближайший start_date/end_date и переводит
+голосования 'upcoming' -> 'open' -> 'closed'. При открытии и закрытии он
+рассылает уведомления собственникам одним INSERT ... SELECT, а при закрытии
+сразу записывает снимок итоговых результатов. Обработчики запросов читают
+Voting.state; Voting.is_open() дополнительно сверяет даты, чтобы голосование
+не оставалось открытым до следующего шага планировщика.
+"""
+
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert, select, literal
+
+from model.db_models import db, Voting, Property, User, Notification
+from utils.voting_results import get_snapshot
+
+# Тексты уведомлений по новому состоянию голосования
+NOTIFICATIONS = {
+    'open': ('voting_opened', 'Открыто голосование "{title}"', 'Голосование началось, вы можете проголосовать до {end}'),
+    'closed': ('voting_closed', 'Завершено голосование "{title}"', 'Голосование завершено, итоги опубликованы'),
+}
+
+
+def _notify_owners(voting, state, now):
+    """Ставит уведомление о смене состояния всем активным собственникам одним запросом"""
+    notification_type, title, message = NOTIFICATIONS[state]
+    title = title.format(title=voting.title)[:200]
+    message = message.format(end=voting.end_date.strftime('%d.%m.%Y %H:%M'))
+    owners = select(
+        Property.owner_id,
+        literal(title),
+        literal(message),
+        literal(notification_type),
+        literal(voting.id),
+        literal(False),
+        literal(now)
+    ).join(User, User.id == Property.owner_id).where(User.is_active.is_(True)).distinct()
+    db.session.execute(insert(Notification).from_select(
+        ['user_id', 'title', 'message', 'type', 'related_id', 'is_read', 'created_at'],
+        owners
+    ))
+
+
+def _switch(voting_ids, from_states, state, now):
+    """
+    Переводит голосования в новое состояние условным UPDATE. Если приложение
+    запущено в нескольких процессах, переход (и уведомления) выполнит только
+    тот, чей UPDATE изменил строку. Об отключенных администратором
+    голосованиях (is_active = False) собственники не уведомляются.
+
+    Returns:
+        list: ID голосований, переведенных этим процессом
+    """
+    switched = []
+    for voting_id in voting_ids:
+        updated = Voting.query.filter(
+            Voting.id == voting_id,
+            Voting.state.in_(from_states)
+        ).update({'state': state}, synchronize_session=False)
+        if updated:
+            voting = db.session.get(Voting, voting_id)
+            if voting.is_active:
+                _notify_owners(voting, state, now)
+            switched.append(voting_id)
+        db.session.commit()
+    return switched
+
+
+def advance_votings(now=None):
+    """
+    Переводит голосования, у которых наступил start_date или end_date
+
+    Args:
+        now (datetime): Текущее время UTC (по умолчанию datetime.utcnow())
+
+    Returns:
+        tuple: (ID открытых голосований, ID закрытых голосований)
+    """
+    now = now or datetime.utcnow()
+
+    to_open = [row[0] for row in db.session.query(Voting.id).filter(
+        Voting.state == 'upcoming',
+        Voting.start_date <= now,
+        Voting.end_date >= now
+    )]
+    opened = _switch(to_open, ('upcoming',), 'open', now)
+
+    to_close = [row[0] for row in db.session.query(Voting.id).filter(
+        Voting.state != 'closed',
+        Voting.end_date < now
+    )]
+    closed = _switch(to_close, ('upcoming', 'open'), 'closed', now)
+
+    # Итоги фиксируются сразу, а не при первом открытии страницы результатов
+    for voting_id in closed:
+        get_snapshot(db.session.get(Voting, voting_id))
+
+    return opened, closed
+
+
+def next_transition():
+    """
+    Returns:
+        datetime: Ближайший будущий start_date/end_date или None
+    """
+    next_start = db.session.query(db.func.min(Voting.start_date)).filter(
+        Voting.state == 'upcoming'
+    ).scalar()
+    next_end = db.session.query(db.func.min(Voting.end_date)).filter(
+        Voting.state != 'closed'
+    ).scalar()
+    moments = [moment for moment in (next_start, next_end) if moment is not None]
+    return min(moments) if moments else None
+
+
+class VotingScheduler:
+    """Фоновый поток, переключающий состояния голосований по расписанию"""
+
+    def __init__(self, max_sleep=60.0):
+        # Даже без wake() поток перечитывает расписание не реже чем раз в
+        # max_sleep секунд: голосование могли создать в другом процессе
+        self.max_sleep = max_sleep
+        self.app = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        """
+        Поток запускается при первом запросе, чтобы не стартовать из CLI-скриптов.
+        Без потока (VOTING_SCHEDULER = False) наступившие переходы выполняются
+        перед каждым запросом.
+        """
+        self.app = app
+        if not app.config.get('VOTING_SCHEDULER', True):
+            @app.before_request
+            def _advance_votings():
+                advance_votings()
+            return
+
+        @app.before_request
+        def _start_voting_scheduler():
+            self.start()
+
+    def start(self):
+        """Запускает поток планировщика (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='voting-scheduler', daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        """Перечитать расписание: голосование создано или изменены его даты"""
+        self._wake.set()
+
+    def _tick(self):
+        """Выполняет наступившие переходы и возвращает паузу до следующего, сек"""
+        with self.app.app_context():
+            try:
+                advance_votings()
+                moment = next_transition()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('Ошибка планировщика голосований')
+                return self.max_sleep
+            finally:
+                db.session.remove()
+        if moment is None:
+            return self.max_sleep
+        delay = (moment - datetime.utcnow()).total_seconds()
+        return min(self.max_sleep, max(delay, 0.05))
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._tick())
+            self._wake.clear()
+
+
+scheduler = VotingScheduler()
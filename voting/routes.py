@@ -1,16 +1,30 @@
-from flask import render_template, redirect, url_for, flash, request, abort, jsonify
+from flask import render_template, redirect, url_for, flash, request, abort, jsonify, current_app, Response
 from flask_login import login_required, current_user
 from . import voting
 from model.db_models import db, Voting, VotingOption, Vote, Property, User
 from datetime import datetime, timedelta
 from utils.content_password import check_content_access, has_content_password, set_content_password, remove_content_password
+from utils.vote_counters import recount_voting, change_property_area
+from utils.vote_submission import cast_votes, find_option, VoteConflict
+from utils.live_results import broker
+from utils.voting_listing import voting_list_query
+from utils.my_properties import my_property_ids, my_vote, has_voted
+from utils.voting_scheduler import scheduler
+from utils.keyset import keyset_paginate
+from sqlalchemy.orm import contains_eager
+from utils.voting_results import property_votes_query, get_snapshot, invalidate_snapshots, ListPagination, turnout_series, TURNOUT_BUCKETS
 import json
+import queue
+
+# Проверки "мои квартиры" / "я голосовал" доступны во всех шаблонах
+voting.add_app_template_global(my_property_ids)
+voting.add_app_template_global(has_voted)
 
 @voting.route('/')
 def index():
     """Главная страница системы голосования"""
     page = request.args.get('page', 1, type=int)
-    votings = Voting.query.order_by(Voting.created_at.desc()).paginate(
+    votings = voting_list_query().order_by(Voting.created_at.desc()).paginate(
         page=page, per_page=10, error_out=False)
     return render_template('voting/index.html', votings=votings)
 
@@ -28,21 +42,15 @@ def view_voting(voting_id):
                              content_type='voting',
                              content_id=voting_id)
     
-    results, total_votes = voting_obj.get_results()
-    
-    # Проверяем, голосовал ли текущий пользователь
-    user_voted = False
-    user_vote = None
-    if current_user.is_authenticated:
-        for property in current_user.properties:
-            vote = db.session.query(Vote).filter_by(
-                voting_id=voting_id, 
-                property_id=property.id
-            ).first()
-            if vote:
-                user_voted = True
-                user_vote = vote
-                break
+    snapshot = get_snapshot(voting_obj)
+    if snapshot:
+        results, total_votes = snapshot['results'], snapshot['total_votes']
+    else:
+        results, total_votes = voting_obj.get_results()
+    
+    # Проверяем, голосовал ли текущий пользователь (один запрос IN по его квартирам)
+    user_vote = my_vote(voting_id)
+    user_voted = user_vote is not None
     
     return render_template('voting/view.html', 
                          voting=voting_obj, 
@@ -51,6 +59,41 @@ def view_voting(voting_id):
                          user_voted=user_voted,
                          user_vote=user_vote)
 
+@voting.route('/voting/<int:voting_id>/live')
+def live_results(voting_id):
+    """Поток приращений результатов голосования (Server-Sent Events)"""
+    voting_obj = db.session.get(Voting, voting_id)
+    if voting_obj is None:
+        abort(404)
+    if not check_content_access('voting', voting_id):
+        abort(403)
+    if not voting_obj.is_open():
+        # 204 останавливает переподключения EventSource
+        return Response(status=204)
+    
+    # Поток завершается после окончания голосования, иначе соединение и поток
+    # обработчика держатся, пока клиент не закроет страницу
+    end_date = voting_obj.end_date
+    subscriber = broker.subscribe(voting_id)
+    
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    delta = subscriber.get(timeout=15)
+                except queue.Empty:
+                    if datetime.utcnow() > end_date:
+                        return
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'event: tally\ndata: {json.dumps(delta)}\n\n'
+        finally:
+            broker.unsubscribe(voting_id, subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @voting.route('/create', methods=['GET', 'POST'])
 @login_required
 def create_voting():
@@ -109,6 +152,7 @@ def create_voting():
                 db.session.add(option)
         
         db.session.commit()
+        scheduler.wake()
         flash('Голосование успешно создано!')
         return redirect(url_for('voting.view_voting', voting_id=voting_obj.id))
     
@@ -128,40 +172,29 @@ def submit_vote(voting_id):
         flash('Голосование закрыто или еще не началось')
         return redirect(url_for('voting.view_voting', voting_id=voting_id))
     
-    # Проверяем, есть ли у пользователя собственность
-    if not current_user.properties:
+    # Квартиры пользователя одним запросом
+    properties = db.session.query(Property.id, Property.number, Property.area).filter_by(
+        owner_id=current_user.id).all()
+    if not properties:
         flash('У вас должна быть зарегистрирована собственность для участия в голосовании')
         return redirect(url_for('voting.view_voting', voting_id=voting_id))
     
-    # Проверяем, голосовал ли уже пользователь
-    for property in current_user.properties:
-        existing_vote = db.session.query(Vote).filter_by(
-            voting_id=voting_id, 
-            property_id=property.id
-        ).first()
-        if existing_vote:
-            flash('Вы уже участвовали в этом голосовании')
-            return redirect(url_for('voting.view_voting', voting_id=voting_id))
-    
     # Проверяем, существует ли вариант ответа
-    option = db.session.query(VotingOption).filter_by(
-        id=option_id, 
-        voting_id=voting_id
-    ).first()
-    if not option:
+    if find_option(voting_id, option_id) is None:
         flash('Неверный вариант ответа')
         return redirect(url_for('voting.view_voting', voting_id=voting_id))
     
-    # Создаем голос для каждой собственности пользователя
-    for property in current_user.properties:
-        vote = Vote(
-            voting_id=voting_id,
-            property_id=property.id,
-            option_id=option_id
-        )
-        db.session.add(vote)
+    # Голос для каждой собственности пользователя одним INSERT; повторное
+    # голосование отсекает уникальный индекс (voting_id, property_id)
+    try:
+        cast_votes(voting_id, option_id, properties)
+    except VoteConflict as conflict:
+        flash(f'Вы уже участвовали в этом голосовании (квартиры: {conflict})')
+        return redirect(url_for('voting.view_voting', voting_id=voting_id))
+    
+    # Сообщаем зрителям страницы голосования о новых голосах
+    broker.publish(voting_id, option_id, len(properties), sum(area for _, _, area in properties))
     
-    db.session.commit()
     flash('Ваш голос учтен!')
     return redirect(url_for('voting.view_voting', voting_id=voting_id))
 
@@ -179,44 +212,77 @@ def results(voting_id):
                              content_type='voting',
                              content_id=voting_id)
     
-    results, total_votes = voting_obj.get_results()
+    page = request.args.get('page', 1, type=int)
+    snapshot = get_snapshot(voting_obj)
+    if snapshot:
+        # Голосование завершено — отдаем зафиксированные результаты
+        results, total_votes = snapshot['results'], snapshot['total_votes']
+        area_results, area_summary = snapshot['area_results'], snapshot['area_summary']
+    else:
+        results, total_votes = voting_obj.get_results()
+        area_results, area_summary = voting_obj.get_area_results(current_app.config['VOTING_QUORUM_PERCENT'])
     
-    # Получаем статистику по собственности
-    property_stats = {}
+    # Получаем статистику по собственности одним запросом, постранично
+    property_stats = None
     if current_user.is_authenticated and getattr(current_user, 'is_admin', False):
         # Администратор видит все квартиры
-        properties = db.session.query(Property).all()
+        if snapshot:
+            property_stats = ListPagination(rows=snapshot['properties'],
+                                            page=page, per_page=50, error_out=False)
+        else:
+            property_stats = property_votes_query(voting_id).paginate(
+                page=page, per_page=50, error_out=False)
     elif current_user.is_authenticated:
         # Обычный пользователь видит только свои квартиры
-        properties = current_user.properties
-    else:
-        properties = []
-    for property in properties:
-        vote = db.session.query(Vote).filter_by(
-            voting_id=voting_id, 
-            property_id=property.id
-        ).first()
-        if vote:
-            property_stats[property.number] = {
-                'area': property.area,
-                'vote': vote.option.text,
-                'owner': property.owner.username,
-                'street': property.street,
-                'house_number': property.house_number
-            }
+        if snapshot:
+            own = [row for row in snapshot['properties'] if row['owner_id'] == current_user.id]
+            property_stats = ListPagination(rows=own, page=page, per_page=50, error_out=False)
+        else:
+            property_stats = property_votes_query(voting_id, owner_id=current_user.id).paginate(
+                page=page, per_page=50, error_out=False)
     
     return render_template('voting/results.html', 
                          voting=voting_obj, 
                          results=results, 
                          total_votes=total_votes,
+                         area_results=area_results,
+                         area_summary=area_summary,
                          property_stats=property_stats)
 
+@voting.route('/results/<int:voting_id>/turnout')
+def turnout(voting_id):
+    """Ряд явки голосования по часам или дням (JSON для графика)"""
+    voting_obj = db.session.get(Voting, voting_id)
+    if voting_obj is None:
+        abort(404)
+    if not check_content_access('voting', voting_id):
+        abort(403)
+    
+    bucket = request.args.get('bucket', 'hour')
+    if bucket not in TURNOUT_BUCKETS:
+        abort(400)
+    
+    snapshot = get_snapshot(voting_obj)
+    if snapshot and 'turnout' in snapshot:
+        # Голосование завершено — ряд посчитан при фиксации итогов
+        points = snapshot['turnout'][bucket]
+        registry_area = snapshot['area_summary']['registry_area']
+    else:
+        points = turnout_series(voting_id, bucket)
+        registry_area = round(db.session.query(db.func.coalesce(db.func.sum(Property.area), 0)).scalar(), 2)
+    
+    return jsonify({
+        'bucket': bucket,
+        'registry_area': registry_area,
+        'points': points
+    })
+
 @voting.route('/my-votings')
 @login_required
 def my_votings():
     """Голосования, созданные текущим пользователем"""
     page = request.args.get('page', 1, type=int)
-    votings = Voting.query.filter_by(created_by=current_user.id).order_by(
+    votings = voting_list_query().filter(Voting.created_by == current_user.id).order_by(
         Voting.created_at.desc()).paginate(page=page, per_page=10, error_out=False)
     return render_template('voting/my_votings.html', votings=votings)
 
@@ -271,6 +337,7 @@ def edit_voting(voting_id):
         voting_obj.question = question
         voting_obj.start_date = start_date
         voting_obj.end_date = end_date
+        voting_obj.reset_state()
         
         # Удаляем старые варианты и добавляем новые
         db.session.query(VotingOption).filter_by(voting_id=voting_id).delete()
@@ -281,8 +348,15 @@ def edit_voting(voting_id):
                     voting_id=voting_id
                 )
                 db.session.add(option)
+        db.session.flush()
+        
+        # Варианты пересозданы — пересчитываем счетчики по таблице vote
+        # и сбрасываем зафиксированные результаты
+        recount_voting(voting_id)
+        invalidate_snapshots([voting_id])
         
         db.session.commit()
+        scheduler.wake()
         flash('Голосование успешно обновлено!')
         return redirect(url_for('voting.view_voting', voting_id=voting_id))
     
@@ -365,14 +439,22 @@ def add_property():
 @login_required
 def my_votes():
     """Страница с голосами текущего пользователя"""
-    page = request.args.get('page', 1, type=int)
-    
-    # Получаем голоса пользователя через его собственность
-    votes = db.session.query(Vote).join(Vote.property).filter(
-        Property.owner_id == current_user.id
-    ).join(Vote.voting).join(Vote.option).order_by(
-        Vote.created_at.desc()
-    ).paginate(page=page, per_page=20, error_out=False)
+    property_ids = my_property_ids()
+    
+    # Голоса пользователя по ID его квартир; голосование, вариант и квартира
+    # подгружаются тем же запросом. Страницы выбираются по курсору (voted_at, id)
+    query = db.session.query(Vote).filter(
+        Vote.property_id.in_(property_ids)
+    ).join(Vote.property).join(Vote.voting).join(Vote.option).options(
+        contains_eager(Vote.property), contains_eager(Vote.voting), contains_eager(Vote.option)
+    )
+    # Счетчик без JOIN идет по индексу ix_vote_property_voted_at
+    total = db.session.query(db.func.count(Vote.id)).filter(
+        Vote.property_id.in_(property_ids)
+    ).scalar()
+    votes = keyset_paginate(query, Vote.voted_at, Vote.id, per_page=20,
+                            after=request.args.get('after'), before=request.args.get('before'),
+                            total=total)
     
     return render_template('voting/my_votes.html', votes=votes, datetime=datetime)
 
@@ -417,6 +499,8 @@ def edit_property(property_id):
         property_obj.entrance = entrance if entrance else None
         property_obj.floor = floor if floor else None
         property_obj.number = number
+        # Площадь уже учтена в votes_area голосований, где квартира голосовала
+        change_property_area(property_id, area - (property_obj.area or 0))
         property_obj.area = area
         db.session.commit()
         